@@ -0,0 +1,37 @@
+"""Unique (user_id, badge_id) index on user_badges
+
+BadgeCRUD.award_badge inserts with ON CONFLICT (user_id, badge_id) DO NOTHING,
+which needs this index. Base.metadata.create_all only adds it to new tables,
+so databases created earlier get it here. Duplicate awards are removed first.
+
+Revision ID: 0001_unique_user_badge
+Revises: 
+Create Date: 2026-10-15 22:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_unique_user_badge'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep one row per (user, badge) so the unique index can be built
+    op.execute(
+        "DELETE FROM user_badges WHERE id NOT IN "
+        "(SELECT MIN(id) FROM user_badges GROUP BY user_id, badge_id)"
+    )
+    # IF NOT EXISTS: databases created by init_db already have the index
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_user_badge_user_badge "
+        "ON user_badges (user_id, badge_id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_user_badge_user_badge")
@@ -0,0 +1,89 @@
+"""JSONB document columns and the composite, partial and GIN indexes
+
+Base.metadata.create_all never alters existing tables, so databases created
+before JSONDocument still have json columns (json_array_length compiles to
+jsonb_array_length on PostgreSQL and fails on them) and lack the composite,
+partial and GIN indexes declared in app.db.models. The composites replace the
+single-column user_id indexes, which are dropped.
+
+Revision ID: 0002_jsonb_and_user_indexes
+Revises: 0001_unique_user_badge
+Create Date: 2026-10-15 22:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_jsonb_and_user_indexes'
+down_revision = '0001_unique_user_badge'
+branch_labels = None
+depends_on = None
+
+
+# Every JSONDocument column in app.db.models
+JSON_DOCUMENT_COLUMNS = (
+    ('problems', 'bugs'),
+    ('problems', 'test_cases'),
+    ('problems', 'learning_objectives'),
+    ('submissions', 'bugs_reported'),
+    ('submissions', 'correct_bugs'),
+    ('submissions', 'missed_bugs'),
+    ('submissions', 'false_positives'),
+    ('submissions', 'detailed_feedback'),
+    ('badges', 'requirements'),
+    ('user_badges', 'progress_data'),
+)
+
+COMPOSITE_INDEXES = (
+    ('idx_session_user_started', 'game_sessions', 'user_id, started_at DESC'),
+    ('idx_session_user_status_difficulty', 'game_sessions', 'user_id, status, difficulty'),
+    ('idx_submission_user_submitted', 'submissions', 'user_id, submitted_at DESC'),
+    ('idx_submission_user_score_max', 'submissions', 'user_id, score, max_score'),
+    ('idx_leaderboard_type_rank', 'leaderboard', 'board_type, rank'),
+)
+
+# Superseded by the composites above, which lead with user_id
+REPLACED_INDEXES = (
+    ('idx_session_user_id', 'game_sessions', 'user_id'),
+    ('idx_submission_user_id', 'submissions', 'user_id'),
+)
+
+
+def upgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+
+    if is_postgresql:
+        for table, column in JSON_DOCUMENT_COLUMNS:
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE jsonb USING {column}::jsonb")
+        op.execute("CREATE INDEX IF NOT EXISTS idx_problem_bugs_gin ON problems USING gin (bugs)")
+
+    for name, table, columns in COMPOSITE_INDEXES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    # Same predicate create_all renders for is_active.is_(True) on each dialect
+    active = "true" if is_postgresql else "1"
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_problem_active_difficulty "
+        f"ON problems (difficulty) WHERE is_active IS {active}"
+    )
+
+    for name, _, _ in REPLACED_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+
+    for name, table, columns in REPLACED_INDEXES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    op.execute("DROP INDEX IF EXISTS idx_problem_active_difficulty")
+    for name, _, _ in COMPOSITE_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    if is_postgresql:
+        op.execute("DROP INDEX IF EXISTS idx_problem_bugs_gin")
+        for table, column in JSON_DOCUMENT_COLUMNS:
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE json USING {column}::json")
@@ -0,0 +1,53 @@
+"""
+Shared request dependencies
+"""
+
+from fastapi import Depends, HTTPException, Request, status
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.db.database import get_db
+from app.services.auth_service import AuthService, UserView
+
+# Endpoints and dependencies that use the synchronous SQLAlchemy session from
+# get_db are plain ``def``, so FastAPI runs them in its threadpool rather than
+# blocking the event loop.
+
+# Token -> user resolution is backed by AuthService's in-process token and
+# user caches, so repeat requests from the same user skip the SQL lookup.
+class BearerAuth:
+    """Resolve the bearer token straight from the Authorization header.
+
+    One dependency instead of HTTPBearer + a wrapper, so each request walks
+    a single node in the dependency graph.
+    """
+
+    def __init__(self, required: bool):
+        self.required = required
+
+    def __call__(self, request: Request, db: Session = Depends(get_db)) -> Optional[UserView]:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            if self.required:
+                # Same response HTTPBearer(auto_error=True) used to give
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+            return None
+
+        try:
+            user = AuthService.get_current_user(db, token)
+        except Exception:
+            if self.required:
+                raise
+            user = None
+
+        if user is None and self.required:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return user
+
+
+require_user = BearerAuth(required=True)
+# Doesn't raise if not authenticated; invalid or expired tokens resolve to None
+optional_user = BearerAuth(required=False)
@@ -2,17 +2,24 @@
 Authentication endpoints for user registration and login
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import threading
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.db.database import get_db
-from app.services.auth_service import AuthService
-from app.db.models import User
+from app.services.auth_service import AuthService, UserView
+from app.api.v1.dependencies import require_user
 
+# Register and login stay async: AuthService offloads their DB calls and
+# password hashing to worker threads itself.
 router = APIRouter()
-security = HTTPBearer()
+
+# Email -> availability, for signup forms that poll check-email per keystroke
+EMAIL_CHECK_TTL_SECONDS = 5
+_email_availability_cache: TTLCache = TTLCache(maxsize=10_000, ttl=EMAIL_CHECK_TTL_SECONDS)
+_email_availability_lock = threading.Lock()
 
 
 # Request/Response Models
@@ -27,6 +34,8 @@ class UserLoginRequest(BaseModel):
     password: str
 
 
+# Responses below are built from our own DB rows and AuthService output, so the
+# handlers use model_construct() to skip re-validating already-typed values.
 class UserResponse(BaseModel):
     id: str
     username: str
@@ -49,52 +58,22 @@ class AuthResponse(BaseModel):
     error: Optional[str] = None
 
 
+class PasswordValidationRequest(BaseModel):
+    password: str
+
+
 class PasswordValidationResponse(BaseModel):
     valid: bool
     errors: list[str]
 
 
-# Dependency to get current user
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    token = credentials.credentials
-    user = AuthService.get_current_user(db, token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
-
-
-# Optional dependency for current user (doesn't raise error if not authenticated)
-async def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
-    """Get current user if authenticated, None otherwise"""
-    if not credentials:
-        return None
-    
-    try:
-        token = credentials.credentials
-        return AuthService.get_current_user(db, token)
-    except Exception:
-        # If token is invalid or expired, return None instead of raising error
-        return None
-
-
 @router.post("/register", response_model=AuthResponse)
 async def register_user(request: UserRegisterRequest, db: Session = Depends(get_db)):
     """Register a new user"""
     
     # Validate email format
     if not AuthService.validate_email(request.email):
-        return AuthResponse(
+        return AuthResponse.model_construct(
             success=False,
             error="Invalid email format"
         )
@@ -102,13 +81,13 @@ async def register_user(request: UserRegisterRequest, db: Session = Depends(get_
     # Validate password strength
     password_validation = AuthService.validate_password(request.password)
     if not password_validation["valid"]:
-        return AuthResponse(
+        return AuthResponse.model_construct(
             success=False,
             error="Password validation failed: " + "; ".join(password_validation["errors"])
         )
     
     # Register user
-    result = AuthService.register_user(
+    result = await AuthService.register_user(
         db=db,
         email=request.email,
         password=request.password,
@@ -116,15 +95,18 @@ async def register_user(request: UserRegisterRequest, db: Session = Depends(get_
     )
     
     if not result["success"]:
-        return AuthResponse(
+        return AuthResponse.model_construct(
             success=False,
             error=result["error"]
         )
     
+    with _email_availability_lock:
+        _email_availability_cache[request.email] = False
+    
     user_data = result["user"]
-    return AuthResponse(
+    return AuthResponse.model_construct(
         success=True,
-        user=UserResponse(
+        user=UserResponse.model_construct(
             id=user_data["id"],
             username=user_data["username"],
             email=user_data["email"],
@@ -146,22 +128,22 @@ async def register_user(request: UserRegisterRequest, db: Session = Depends(get_
 async def login_user(request: UserLoginRequest, db: Session = Depends(get_db)):
     """Login user with email and password"""
     
-    result = AuthService.authenticate_user(
+    result = await AuthService.authenticate_user(
         db=db,
         email=request.email,
         password=request.password
     )
     
     if not result["success"]:
-        return AuthResponse(
+        return AuthResponse.model_construct(
             success=False,
             error=result["error"]
         )
     
     user_data = result["user"]
-    return AuthResponse(
+    return AuthResponse.model_construct(
         success=True,
-        user=UserResponse(
+        user=UserResponse.model_construct(
             id=user_data["id"],
             username=user_data["username"],
             email=user_data["email"],
@@ -180,9 +162,9 @@ async def login_user(request: UserLoginRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: UserView = Depends(require_user)):
     """Get current user information"""
-    return UserResponse(
+    return UserResponse.model_construct(
         id=current_user.id,
         username=current_user.username,
         email=current_user.email,
@@ -193,14 +175,14 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         total_bugs_found=current_user.total_bugs_found,
         accuracy_rate=current_user.accuracy_rate,
         is_verified=current_user.is_verified,
-        created_at=current_user.created_at.isoformat() if current_user.created_at else None
+        created_at=current_user.created_at_iso
     )
 
 
 @router.post("/validate-password", response_model=PasswordValidationResponse)
-async def validate_password(password: str):
+async def validate_password(request: PasswordValidationRequest):
     """Validate password strength"""
-    result = AuthService.validate_password(password)
+    result = AuthService.validate_password(request.password)
     return PasswordValidationResponse(
         valid=result["valid"],
         errors=result["errors"]
@@ -208,7 +190,7 @@ async def validate_password(password: str):
 
 
 @router.post("/logout")
-async def logout_user(current_user: User = Depends(get_current_user)):
+async def logout_user(current_user: UserView = Depends(require_user)):
     """Logout user (client should remove token)"""
     return {
         "success": True,
@@ -217,12 +199,19 @@ async def logout_user(current_user: User = Depends(get_current_user)):
 
 
 @router.get("/check-email/{email}")
-async def check_email_availability(email: str, db: Session = Depends(get_db)):
+def check_email_availability(email: str, db: Session = Depends(get_db)):
     """Check if email is available for registration"""
     from app.db.crud import UserCRUD
     
-    existing_user = UserCRUD.get_user_by_email(db, email)
+    with _email_availability_lock:
+        available = _email_availability_cache.get(email)
+    
+    if available is None:
+        available = UserCRUD.get_user_by_email(db, email) is None
+        with _email_availability_lock:
+            _email_availability_cache[email] = available
+    
     return {
-        "available": existing_user is None,
-        "message": "Email is available" if existing_user is None else "Email is already registered"
+        "available": available,
+        "message": "Email is available" if available else "Email is already registered"
     }
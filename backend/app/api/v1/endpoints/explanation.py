@@ -2,13 +2,36 @@
 Problem explanation and solution endpoints
 """
 
-from fastapi import APIRouter, HTTPException
+import orjson
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from app.services.problem_service import problem_service
 
 router = APIRouter()
 
+# Everything under /explanation is derived from the problem catalog, so one
+# catalog-wide ETag lets browsers and CDNs revalidate instead of refetching.
+CATALOG_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=60"
+
+
+def _catalog_headers() -> Dict[str, str]:
+    """Caching headers shared by every catalog-derived response"""
+    return {
+        "ETag": problem_service.catalog_etag,
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+    }
+
+
+def _not_modified(request: Request, response: Response) -> Optional[Response]:
+    """Return a 304 if the client already has the current catalog, else tag the response"""
+    headers = _catalog_headers()
+    if request.headers.get("if-none-match") == problem_service.catalog_etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
 
 class ExplanationResponse(BaseModel):
     problem_id: str
@@ -24,33 +47,31 @@ class ExplanationResponse(BaseModel):
 
 
 @router.get("/problem/{problem_id}", response_model=ExplanationResponse)
-async def get_problem_explanation(problem_id: str):
+async def get_problem_explanation(problem_id: str, request: Request, response: Response):
     """Get detailed explanation for a specific problem"""
     
-    problem = problem_service.get_problem_by_id(problem_id)
-    if not problem:
+    if not problem_service.get_problem_by_id(problem_id):
         raise HTTPException(status_code=404, detail="Problem not found")
     
-    # Generate detailed explanation
-    detailed_explanation = _generate_detailed_explanation(problem)
+    not_modified = _not_modified(request, response)
+    if not_modified:
+        return not_modified
     
-    return ExplanationResponse(
-        problem_id=problem['id'],
-        title=problem['title'],
-        difficulty=problem['difficulty'],
-        category=problem['category'],
-        description=problem['description'],
-        code=problem['code'],
-        bugs=problem['bugs'],
-        test_cases=problem.get('test_cases', []),
-        learning_objectives=problem.get('learning_objectives', []),
-        detailed_explanation=detailed_explanation
+    # The body is encoded once per problem and served as-is afterwards
+    return Response(
+        _explanation_body(problem_id),
+        media_type="application/json",
+        headers=_catalog_headers(),
     )
 
 
 @router.get("/problems")
-async def get_all_problems():
+async def get_all_problems(request: Request, response: Response):
     """Get list of all available problems"""
+    not_modified = _not_modified(request, response)
+    if not_modified:
+        return not_modified
+    
     problems = problem_service.get_all_problems()
     
     # Return summary information
@@ -69,93 +90,134 @@ async def get_all_problems():
 
 
 @router.get("/stats")
-async def get_problem_stats():
+async def get_problem_stats(request: Request, response: Response):
     """Get statistics about available problems"""
+    not_modified = _not_modified(request, response)
+    if not_modified:
+        return not_modified
     return problem_service.get_problem_stats()
 
 
+@lru_cache(maxsize=256)
+def _explanation_body(problem_id: str) -> bytes:
+    """Encode a problem's ExplanationResponse once; problem files are static"""
+    problem = problem_service.get_problem_by_id(problem_id)
+    explanation = ExplanationResponse(
+        problem_id=problem['id'],
+        title=problem['title'],
+        difficulty=problem['difficulty'],
+        category=problem['category'],
+        description=problem['description'],
+        code=problem['code'],
+        bugs=problem['bugs'],
+        test_cases=problem.get('test_cases', []),
+        learning_objectives=problem.get('learning_objectives', []),
+        detailed_explanation=_generate_detailed_explanation(problem)
+    )
+    return orjson.dumps(explanation.model_dump())
+
+
+_BUG_TEMPLATE = (
+    "\n### Bug #{index} - Line {line_number}\n"
+    "**Type:** {type}\n"
+    "**Severity:** {severity}\n"
+    "**Description:** {description}\n"
+    "**Explanation:** {explanation}\n"
+    "**Fix Suggestion:** {fix_suggestion}"
+)
+
+# (test case key, label) in display order
+_TEST_CASE_FIELDS = (
+    ('input', 'Input'),
+    ('expected_output', 'Expected Output'),
+    ('expected_error', 'Expected Error'),
+    ('expected_vulnerability', 'Vulnerability'),
+)
+
+
 def _generate_detailed_explanation(problem: Dict) -> str:
     """Generate a comprehensive explanation for the problem"""
     
-    explanation_parts = []
-    
-    # Problem overview
-    explanation_parts.append(f"## 🎯 Problem: {problem['title']}")
-    explanation_parts.append(f"**Difficulty:** {problem['difficulty'].title()}")
-    explanation_parts.append(f"**Category:** {problem['category'].replace('_', ' ').title()}")
-    explanation_parts.append(f"\n{problem['description']}")
-    
-    # Bug analysis
-    explanation_parts.append("\n## 🐛 Bug Analysis")
-    for i, bug in enumerate(problem['bugs'], 1):
-        explanation_parts.append(f"\n### Bug #{i} - Line {bug['line_number']}")
-        explanation_parts.append(f"**Type:** {bug['type'].replace('_', ' ').title()}")
-        explanation_parts.append(f"**Severity:** {bug['severity'].title()}")
-        explanation_parts.append(f"**Description:** {bug['description']}")
-        explanation_parts.append(f"**Explanation:** {bug['explanation']}")
-        explanation_parts.append(f"**Fix Suggestion:** {bug['fix_suggestion']}")
+    # Problem overview and bug analysis
+    sections = [
+        f"## 🎯 Problem: {problem['title']}\n"
+        f"**Difficulty:** {problem['difficulty'].title()}\n"
+        f"**Category:** {problem['category'].replace('_', ' ').title()}\n"
+        f"\n{problem['description']}\n"
+        "\n## 🐛 Bug Analysis"
+    ]
+    sections.extend(
+        _BUG_TEMPLATE.format(
+            index=i,
+            line_number=bug['line_number'],
+            type=bug['type'].replace('_', ' ').title(),
+            severity=bug['severity'].title(),
+            description=bug['description'],
+            explanation=bug['explanation'],
+            fix_suggestion=bug['fix_suggestion'],
+        )
+        for i, bug in enumerate(problem['bugs'], 1)
+    )
     
     # Test cases
     if problem.get('test_cases'):
-        explanation_parts.append("\n## 🧪 Test Cases")
-        for i, test_case in enumerate(problem['test_cases'], 1):
-            explanation_parts.append(f"\n### Test Case #{i}")
-            if 'input' in test_case:
-                explanation_parts.append(f"**Input:** {test_case['input']}")
-            if 'expected_output' in test_case:
-                explanation_parts.append(f"**Expected Output:** {test_case['expected_output']}")
-            if 'expected_error' in test_case:
-                explanation_parts.append(f"**Expected Error:** {test_case['expected_error']}")
-            if 'expected_vulnerability' in test_case:
-                explanation_parts.append(f"**Vulnerability:** {test_case['expected_vulnerability']}")
+        sections.append("\n## 🧪 Test Cases")
+        sections.extend(
+            f"\n### Test Case #{i}" + "".join(
+                f"\n**{label}:** {test_case[key]}"
+                for key, label in _TEST_CASE_FIELDS if key in test_case
+            )
+            for i, test_case in enumerate(problem['test_cases'], 1)
+        )
     
     # Learning objectives
     if problem.get('learning_objectives'):
-        explanation_parts.append("\n## 📚 Learning Objectives")
-        for objective in problem['learning_objectives']:
-            explanation_parts.append(f"- {objective}")
+        sections.append("\n## 📚 Learning Objectives")
+        sections.extend(f"- {objective}" for objective in problem['learning_objectives'])
     
     # Best practices
-    explanation_parts.append("\n## ✅ Best Practices")
-    explanation_parts.append(_get_best_practices_for_category(problem['category']))
+    sections.append("\n## ✅ Best Practices")
+    sections.append(_get_best_practices_for_category(problem['category']))
     
-    return "\n".join(explanation_parts)
+    return "\n".join(sections)
 
 
-def _get_best_practices_for_category(category: str) -> str:
-    """Get best practices based on problem category"""
-    
-    practices = {
-        'runtime_error': """
+_BEST_PRACTICES = {
+    'runtime_error': """
 - Always validate input parameters
 - Handle edge cases (empty collections, null values)
 - Use defensive programming techniques
 - Add proper error handling with try-catch blocks
         """,
-        'logic_error': """
+    'logic_error': """
 - Write comprehensive unit tests
 - Use clear variable names and comments
 - Break complex logic into smaller functions
 - Test boundary conditions thoroughly
         """,
-        'security': """
+    'security': """
 - Never trust user input
 - Use parameterized queries for database operations
 - Implement proper input validation and sanitization
 - Follow the principle of least privilege
         """,
-        'resource_management': """
+    'resource_management': """
 - Always close resources explicitly
 - Use context managers (with statements) when possible
 - Implement proper exception handling
 - Monitor resource usage in production
         """,
-        'concurrency': """
+    'concurrency': """
 - Use proper synchronization mechanisms (locks, semaphores)
 - Avoid shared mutable state when possible
 - Test concurrent code thoroughly
 - Consider using thread-safe data structures
         """
-    }
-    
-    return practices.get(category, "- Follow general coding best practices\n- Write clean, readable code\n- Test thoroughly")
+}
+
+_DEFAULT_BEST_PRACTICES = "- Follow general coding best practices\n- Write clean, readable code\n- Test thoroughly"
+
+
+def _get_best_practices_for_category(category: str) -> str:
+    """Get best practices based on problem category"""
+    return _BEST_PRACTICES.get(category, _DEFAULT_BEST_PRACTICES)
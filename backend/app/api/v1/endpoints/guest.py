@@ -9,6 +9,15 @@ from app.services.guest_service import GuestService
 
 router = APIRouter()
 
+# Shown on every guest profile; built once rather than per request
+_REGISTRATION_BENEFITS = {
+    "permanent_progress": "Never lose your achievements and statistics",
+    "detailed_history": "Track every session with detailed analytics",
+    "leaderboards": "Compete with other players globally",
+    "advanced_features": "Unlock custom difficulty settings and more",
+    "community": "Join the Code Review Quest community"
+}
+
 
 class GuestSessionRequest(BaseModel):
     nickname: Optional[str] = None
@@ -33,14 +42,14 @@ class GuestUpdateRequest(BaseModel):
 async def start_guest_session(request: GuestSessionRequest):
     """Start a new guest session"""
     
-    nickname = request.nickname or f"Guest_{GuestService._generate_guest_id()[:8]}"
-    guest_id = GuestService.create_guest_session(nickname)
+    # create_guest_session derives the default nickname from the new guest ID
+    guest_id = GuestService.create_guest_session(request.nickname)
     
     guest_session = GuestService.get_guest_session(guest_id)
     
     return GuestSessionResponse(
         guest_id=guest_id,
-        nickname=nickname,
+        nickname=guest_session["nickname"],
         expires_at=guest_session["expires_at"],
         message="Guest session created! Your progress will be saved for 24 hours. Register to save permanently."
     )
@@ -67,26 +76,22 @@ async def get_guest_session(guest_id: str):
 async def update_guest_session(guest_id: str, request: GuestUpdateRequest):
     """Update guest session data"""
     
-    guest_session = GuestService.get_guest_session(guest_id)
-    if not guest_session:
-        raise HTTPException(status_code=404, detail="Guest session not found or expired")
-    
-    # Update nickname if provided
-    if request.nickname:
-        GuestService.update_guest_nickname(guest_id, request.nickname)
-    
-    # Update game statistics if provided
-    if request.score is not None:
-        GuestService.update_guest_score(guest_id, request.score)
-    
+    stats_update = {}
     if request.bugs_found is not None:
-        GuestService.update_guest_stats(guest_id, bugs_found=request.bugs_found)
+        stats_update["bugs_found"] = request.bugs_found
     
     if request.time_played is not None:
-        GuestService.update_guest_stats(guest_id, time_played=request.time_played)
+        stats_update["time_played"] = request.time_played
     
     if request.difficulty:
-        GuestService.update_guest_stats(guest_id, difficulty=request.difficulty)
+        stats_update["difficulty"] = request.difficulty
+    
+    # Nickname, score and stats are applied under one session lookup
+    updated = GuestService.apply_guest_update(
+        guest_id, nickname=request.nickname, score=request.score, **stats_update
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Guest session not found or expired")
     
     return {"message": "Guest session updated successfully"}
 
@@ -102,13 +107,7 @@ async def get_guest_profile(guest_id: str):
     return {
         "guest_id": guest_id,
         "profile": guest_profile,
-        "registration_benefits": {
-            "permanent_progress": "Never lose your achievements and statistics",
-            "detailed_history": "Track every session with detailed analytics",
-            "leaderboards": "Compete with other players globally",
-            "advanced_features": "Unlock custom difficulty settings and more",
-            "community": "Join the Code Review Quest community"
-        }
+        "registration_benefits": _REGISTRATION_BENEFITS
     }
 
 
@@ -116,8 +115,8 @@ async def get_guest_profile(guest_id: str):
 async def end_guest_session(guest_id: str):
     """End a guest session (cleanup)"""
     
-    guest_session = GuestService.get_guest_session(guest_id)
-    if not guest_session:
+    guest_profile = GuestService.get_guest_profile(guest_id)
+    if not guest_profile:
         raise HTTPException(status_code=404, detail="Guest session not found or expired")
     
     # In a real implementation, you might want to offer data export
@@ -125,7 +124,7 @@ async def end_guest_session(guest_id: str):
     
     return {
         "message": "Guest session ended. Consider registering to save your progress!",
-        "final_stats": GuestService.get_guest_profile(guest_id)
+        "final_stats": guest_profile
     }
 
 
@@ -2,18 +2,51 @@
 User profile management endpoints with guest support
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from app.db.database import get_db
-from app.db.crud import GameSessionCRUD
+from app.db.crud import GameSessionCRUD, LeaderboardCRUD, LEADERBOARD_SIZE
 from app.services.guest_service import GuestService
-from app.services.auth_service import AuthService
-from app.db.models import User
+from app.services.leaderboard_service import LeaderboardService
+from app.services.auth_service import UserView
+from app.api.v1.dependencies import optional_user
+from app.api.v1.endpoints.session import history_entry
 
 router = APIRouter()
 
+LEADERBOARD_CACHE_CONTROL = "public, max-age=30"
+
+# Static parts of the guest and anonymous profile payloads, built once
+_GUEST_REGISTRATION_SUGGESTION = {
+    "message": "Register to save your progress permanently and unlock advanced features!",
+    "benefits": (
+        "Permanent progress tracking",
+        "Detailed session history",
+        "Advanced statistics",
+        "Achievement system",
+        "Leaderboards",
+        "Custom difficulty settings"
+    )
+}
+
+_ANONYMOUS_PROFILE = {
+    "message": "Create a guest session or register to track your progress",
+    "features_available": (
+        "Play coding challenges",
+        "Basic scoring",
+        "Immediate feedback"
+    ),
+    "features_with_registration": (
+        "Progress tracking",
+        "Session history",
+        "Achievement system",
+        "Detailed statistics",
+        "Leaderboards"
+    )
+}
+
 
 class ProfileResponse(BaseModel):
     user_type: str  # "authenticated", "guest", or "anonymous"
@@ -21,61 +54,19 @@ class ProfileResponse(BaseModel):
 
 
 @router.get("/stats", response_model=ProfileResponse)
-async def get_profile_stats(
+def get_profile_stats(
     guest_id: Optional[str] = None,
     db: Session = Depends(get_db),
-    authorization: Optional[str] = Header(None)
+    current_user: Optional[UserView] = Depends(optional_user)
 ):
     """Get user profile statistics with support for authenticated, guest, and anonymous users"""
     
-    # Try to get authenticated user
-    current_user = None
-    if authorization and authorization.startswith("Bearer "):
-        try:
-            token = authorization.split(" ")[1]
-            current_user = AuthService.get_current_user(db, token)
-        except Exception:
-            pass
-    
     if current_user:
         # Authenticated user - get comprehensive stats from database
-        sessions = GameSessionCRUD.get_user_sessions(db, current_user.id, limit=100)
+        stats = GameSessionCRUD.get_user_stats(db, current_user.id)
+        recent_sessions = GameSessionCRUD.get_recent_sessions(db, current_user.id, limit=5)
         
-        total_sessions = len(sessions)
-        completed_sessions = len([s for s in sessions if s.status == "completed"])
-        total_score = sum([s.final_score or 0 for s in sessions])
-        best_score = max([s.final_score or 0 for s in sessions]) if sessions else 0
-        
-        # Calculate average time and difficulty distribution
-        completed_times = [s.time_spent for s in sessions if s.time_spent]
-        avg_completion_time = sum(completed_times) / len(completed_times) if completed_times else 0
-        
-        difficulty_stats = {}
-        for session in sessions:
-            diff = session.difficulty
-            if diff not in difficulty_stats:
-                difficulty_stats[diff] = {"played": 0, "completed": 0}
-            difficulty_stats[diff]["played"] += 1
-            if session.status == "completed":
-                difficulty_stats[diff]["completed"] += 1
-        
-        profile_data = {
-            "user_id": current_user.id,
-            "email": current_user.email,
-            "username": current_user.username,
-            "is_verified": current_user.is_verified,
-            "member_since": current_user.created_at.isoformat() if current_user.created_at else None,
-            "total_sessions": total_sessions,
-            "completed_sessions": completed_sessions,
-            "completion_rate": (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0,
-            "total_score": total_score,
-            "best_score": best_score,
-            "average_score": (total_score / completed_sessions) if completed_sessions > 0 else 0,
-            "average_completion_time": round(avg_completion_time, 2),
-            "difficulty_breakdown": difficulty_stats,
-            "achievements": _calculate_achievements(sessions),
-            "recent_activity": _get_recent_activity(sessions[:5])
-        }
+        profile_data = _authenticated_profile(current_user, stats, recent_sessions)
         
         return ProfileResponse(user_type="authenticated", profile=profile_data)
     
@@ -85,73 +76,27 @@ async def get_profile_stats(
         if not guest_profile:
             raise HTTPException(status_code=404, detail="Guest session not found or expired")
         
-        profile_data = {
-            "guest_id": guest_id,
-            "session_started": guest_profile["created_at"],
-            "sessions_played": guest_profile["sessions_played"],
-            "total_score": guest_profile["total_score"],
-            "best_score": guest_profile["best_score"],
-            "bugs_found": guest_profile["bugs_found"],
-            "time_played": guest_profile["time_played"],
-            "favorite_difficulty": guest_profile["favorite_difficulty"],
-            "achievements": guest_profile["achievements"],
-            "registration_suggestion": {
-                "message": "Register to save your progress permanently and unlock advanced features!",
-                "benefits": [
-                    "Permanent progress tracking",
-                    "Detailed session history",
-                    "Advanced statistics",
-                    "Achievement system",
-                    "Leaderboards",
-                    "Custom difficulty settings"
-                ]
-            }
-        }
+        profile_data = _guest_profile(guest_id, guest_profile)
         
         return ProfileResponse(user_type="guest", profile=profile_data)
     
     else:
         # Anonymous user
-        profile_data = {
-            "message": "Create a guest session or register to track your progress",
-            "features_available": [
-                "Play coding challenges",
-                "Basic scoring",
-                "Immediate feedback"
-            ],
-            "features_with_registration": [
-                "Progress tracking",
-                "Session history",
-                "Achievement system",
-                "Detailed statistics",
-                "Leaderboards"
-            ]
-        }
-        
-        return ProfileResponse(user_type="anonymous", profile=profile_data)
+        return ProfileResponse(user_type="anonymous", profile=_ANONYMOUS_PROFILE)
 
 
 @router.get("/achievements")
-async def get_achievements(
+def get_achievements(
     guest_id: Optional[str] = None,
     db: Session = Depends(get_db),
-    authorization: Optional[str] = Header(None)
+    current_user: Optional[UserView] = Depends(optional_user)
 ):
     """Get user achievements"""
     
-    # Try to get authenticated user
-    current_user = None
-    if authorization and authorization.startswith("Bearer "):
-        try:
-            token = authorization.split(" ")[1]
-            current_user = AuthService.get_current_user(db, token)
-        except Exception:
-            pass
-    
     if current_user:
         # Authenticated user achievements
-        sessions = GameSessionCRUD.get_user_sessions(db, current_user.id, limit=100)
-        achievements = _calculate_achievements(sessions)
+        stats = GameSessionCRUD.get_user_stats(db, current_user.id)
+        achievements = _calculate_achievements(stats)
         return {"user_type": "authenticated", "achievements": achievements}
     
     elif guest_id:
@@ -174,52 +119,160 @@ async def get_achievements(
         }
 
 
+@router.get("/full")
+def get_full_profile(
+    history_limit: int = 10,
+    guest_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Optional[UserView] = Depends(optional_user)
+):
+    """Get profile stats, achievements and session history in one round trip"""
+    
+    if current_user:
+        # One aggregate query plus one recent-sessions query serve all three views
+        stats = GameSessionCRUD.get_user_stats(db, current_user.id)
+        sessions = GameSessionCRUD.get_recent_sessions(db, current_user.id, limit=max(history_limit, 5))
+        profile_data = _authenticated_profile(current_user, stats, sessions[:5])
+        
+        return {
+            "user_type": "authenticated",
+            "profile": profile_data,
+            "achievements": profile_data["achievements"],
+            "history": [history_entry(session) for session in sessions[:history_limit]]
+        }
+    
+    elif guest_id:
+        guest_profile = GuestService.get_guest_profile(guest_id)
+        if not guest_profile:
+            raise HTTPException(status_code=404, detail="Guest session not found or expired")
+        
+        return {
+            "user_type": "guest",
+            "profile": _guest_profile(guest_id, guest_profile),
+            "achievements": guest_profile["achievements"],
+            "history": []  # Guest sessions are not individually tracked
+        }
+    
+    else:
+        return {
+            "user_type": "anonymous",
+            "profile": _ANONYMOUS_PROFILE,
+            "achievements": [],
+            "history": []
+        }
+
+
 @router.get("/leaderboard")
-async def get_leaderboard(
+def get_leaderboard(
+    request: Request,
+    response: Response,
     limit: int = 10,
     difficulty: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get leaderboard (authenticated users only for privacy)"""
     
-    # Get top performers from database
-    sessions = GameSessionCRUD.get_top_sessions(db, limit=limit, difficulty=difficulty)
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
     
-    leaderboard = []
-    for session in sessions:
-        if session.user and session.user.username:  # Only show users who opted in
-            leaderboard.append({
-                "rank": len(leaderboard) + 1,
-                "username": session.user.username,
-                "score": session.final_score,
-                "difficulty": session.difficulty,
-                "completion_time": session.time_spent,
-                "date": session.completed_at.isoformat() if session.completed_at else None
-            })
+    # Get top performers (cached briefly; see LeaderboardService)
+    leaderboard, etag = LeaderboardService.get_leaderboard(db, limit=limit, difficulty=difficulty)
+    
+    # Public and identical for every caller, so let browsers and CDNs revalidate
+    headers = {"ETag": etag, "Cache-Control": LEADERBOARD_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    return {
+        "leaderboard": leaderboard,
+        "note": "Only registered users appear on leaderboards. Register to compete!"
+    }
+
+
+@router.get("/leaderboard/{board_type}")
+def get_materialized_leaderboard(
+    board_type: str,
+    response: Response,
+    limit: int = 10,
+    db: Session = Depends(get_db)
+):
+    """Get the stored global or weekly leaderboard (rebuilt by scripts/refresh_leaderboards.py)"""
+    limit = min(limit, LEADERBOARD_SIZE)
+    if board_type == "global":
+        leaderboard = LeaderboardCRUD.get_global_leaderboard(db, limit=limit)
+    elif board_type == "weekly":
+        leaderboard = LeaderboardCRUD.get_weekly_leaderboard(db, limit=limit)
+    else:
+        raise HTTPException(status_code=404, detail="Unknown leaderboard")
     
+    response.headers["Cache-Control"] = LEADERBOARD_CACHE_CONTROL
     return {
+        "board_type": board_type,
         "leaderboard": leaderboard,
         "note": "Only registered users appear on leaderboards. Register to compete!"
     }
 
 
-def _calculate_achievements(sessions):
-    """Calculate achievements based on session data"""
+def _authenticated_profile(current_user, stats, recent_sessions):
+    """Build the authenticated profile payload from SQL aggregates and recent sessions"""
+    total_sessions = stats["total_sessions"]
+    completed_sessions = stats["completed_sessions"]
+    total_score = stats["total_score"]
+    
+    return {
+        "user_id": current_user.id,
+        "email": current_user.email,
+        "username": current_user.username,
+        "is_verified": current_user.is_verified,
+        "member_since": current_user.created_at_iso,
+        "total_sessions": total_sessions,
+        "completed_sessions": completed_sessions,
+        "completion_rate": (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0,
+        "total_score": total_score,
+        "best_score": stats["best_score"],
+        "average_score": (total_score / completed_sessions) if completed_sessions > 0 else 0,
+        "average_completion_time": round(stats["average_time_spent"], 2),
+        "difficulty_breakdown": stats["by_difficulty"],
+        "achievements": _calculate_achievements(stats),
+        "recent_activity": _get_recent_activity(recent_sessions)
+    }
+
+
+def _guest_profile(guest_id, guest_profile):
+    """Build the guest profile payload"""
+    return {
+        "guest_id": guest_id,
+        "session_started": guest_profile["created_at"],
+        "sessions_played": guest_profile["sessions_played"],
+        "total_score": guest_profile["total_score"],
+        "best_score": guest_profile["best_score"],
+        "bugs_found": guest_profile["bugs_found"],
+        "time_played": guest_profile["time_played"],
+        "favorite_difficulty": guest_profile["favorite_difficulty"],
+        "achievements": guest_profile["achievements"],
+        "registration_suggestion": _GUEST_REGISTRATION_SUGGESTION
+    }
+
+
+def _calculate_achievements(stats):
+    """Calculate achievements from the aggregates in GameSessionCRUD.get_user_stats"""
     achievements = []
     
-    if not sessions:
+    if not stats["total_sessions"]:
         return achievements
     
-    completed_sessions = [s for s in sessions if s.status == "completed"]
-    total_score = sum([s.final_score or 0 for s in sessions])
+    completed_count = stats["completed_sessions"]
+    total_score = stats["total_score"]
     
     # First completion
-    if completed_sessions:
+    if completed_count:
+        first_completed_at = stats["first_completed_at"]
         achievements.append({
             "name": "First Success",
             "description": "Completed your first coding challenge",
             "earned": True,
-            "date": completed_sessions[0].completed_at.isoformat() if completed_sessions[0].completed_at else None
+            "date": first_completed_at.isoformat() if first_completed_at else None
         })
     
     # Score milestones
@@ -238,14 +291,14 @@ def _calculate_achievements(sessions):
         })
     
     # Session milestones
-    if len(completed_sessions) >= 5:
+    if completed_count >= 5:
         achievements.append({
             "name": "Persistent",
             "description": "Completed 5+ challenges",
             "earned": True
         })
     
-    if len(completed_sessions) >= 20:
+    if completed_count >= 20:
         achievements.append({
             "name": "Dedicated",
             "description": "Completed 20+ challenges",
@@ -253,7 +306,9 @@ def _calculate_achievements(sessions):
         })
     
     # Difficulty achievements
-    difficulties = set([s.difficulty for s in completed_sessions])
+    difficulties = {
+        difficulty for difficulty, counts in stats["by_difficulty"].items() if counts["completed"]
+    }
     if "advanced" in difficulties:
         achievements.append({
             "name": "Expert Level",
@@ -272,7 +327,7 @@ def _calculate_achievements(sessions):
 
 
 def _get_recent_activity(recent_sessions):
-    """Get recent activity summary"""
+    """Get recent activity summary from GameSessionCRUD.get_recent_sessions rows"""
     activity = []
     
     for session in recent_sessions:
@@ -2,21 +2,28 @@
 Session management endpoints with database persistence and guest support
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
+import base64
+import binascii
+import orjson
 import time
+import uuid
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.db.database import get_db
-from app.db.crud import GameSessionCRUD, ProblemCRUD
+from app.db.crud import GameSessionCRUD
 from app.services.problem_service import problem_service
 from app.services.guest_service import GuestService
-from app.services.auth_service import AuthService
-from app.db.models import User
+from app.services.auth_service import UserView
+from app.api.v1.dependencies import optional_user
 import random
 
 router = APIRouter()
 
+_DIFFICULTIES = frozenset({"beginner", "intermediate", "advanced"})
+
 
 class SessionRequest(BaseModel):
     difficulty: str = "beginner"
@@ -37,29 +44,20 @@ class SessionResponse(BaseModel):
 
 
 @router.post("/start", response_model=SessionResponse)
-async def start_session(
+def start_session(
     request: SessionRequest, 
     db: Session = Depends(get_db),
-    authorization: Optional[str] = Header(None)
+    current_user: Optional[UserView] = Depends(optional_user)
 ):
     """Start a new coding challenge session with support for authenticated, guest, and anonymous users"""
     
     # Validate difficulty
-    if request.difficulty not in ["beginner", "intermediate", "advanced"]:
+    if request.difficulty not in _DIFFICULTIES:
         raise HTTPException(status_code=400, detail="Invalid difficulty level")
     
     # Determine user type and ID
     user_type = "anonymous"
     user_id = None
-    current_user = None
-    
-    # Try to get authenticated user
-    if authorization and authorization.startswith("Bearer "):
-        try:
-            token = authorization.split(" ")[1]
-            current_user = AuthService.get_current_user(db, token)
-        except Exception:
-            pass
     
     if current_user:
         user_type = "authenticated"
@@ -74,17 +72,11 @@ async def start_session(
             raise HTTPException(status_code=404, detail="Guest session not found or expired")
     
     # Get problems from database first, fallback to problem service
-    db_problems = ProblemCRUD.get_problems_by_difficulty(db, request.difficulty)
+    db_problems = problem_service.get_db_problems_by_difficulty(db, request.difficulty)
     
     if db_problems:
         # Use database problems
-        selected_problem = random.choice(db_problems)
-        problem_data = {
-            'id': selected_problem.id,
-            'title': selected_problem.title,
-            'category': selected_problem.category,
-            'code': selected_problem.code
-        }
+        problem_data = random.choice(db_problems)
     else:
         # Fallback to problem service
         problem_data = problem_service.get_random_problem(request.difficulty)
@@ -95,7 +87,9 @@ async def start_session(
             )
     
     # Create session in database (only for authenticated users)
-    session_id = f"session_{int(time.time())}"
+    # Random ids: second-resolution timestamps collided for concurrent starts
+    now = time.time()
+    session_id = f"session_{uuid.uuid4().hex}"
     
     if user_type == "authenticated":
         session_data = {
@@ -116,13 +110,13 @@ async def start_session(
         problem_title=problem_data['title'],
         problem_category=problem_data['category'],
         code=problem_data['code'],
-        created_at=time.time(),
+        created_at=now,
         user_type=user_type
     )
 
 
 @router.get("/status/{session_id}")
-async def get_session_status(session_id: str, db: Session = Depends(get_db)):
+def get_session_status(session_id: str, db: Session = Depends(get_db)):
     """Get session status from database (authenticated users only)"""
     
     session = GameSessionCRUD.get_session_by_id(db, session_id)
@@ -149,41 +143,29 @@ async def get_session_status(session_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/history")
-async def get_session_history(
+def get_session_history(
     limit: int = 10, 
     guest_id: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    authorization: Optional[str] = Header(None)
+    current_user: Optional[UserView] = Depends(optional_user)
 ):
-    """Get session history for authenticated users or guest users"""
+    """Get session history for authenticated users or guest users
     
-    # Try to get authenticated user
-    current_user = None
-    if authorization and authorization.startswith("Bearer "):
-        try:
-            token = authorization.split(" ")[1]
-            current_user = AuthService.get_current_user(db, token)
-        except Exception:
-            pass
+    Pass a response's ``next_cursor`` back as ``cursor`` to fetch the next page.
+    """
     
     if current_user:
         # Authenticated user - get from database
-        sessions = GameSessionCRUD.get_user_sessions(db, current_user.id, limit)
+        before = _decode_history_cursor(cursor) if cursor else None
+        sessions = GameSessionCRUD.get_recent_sessions(db, current_user.id, limit, before=before)
+        
+        session_history = [history_entry(session) for session in sessions]
         
-        session_history = []
-        for session in sessions:
-            session_history.append({
-                "session_id": session.session_id,
-                "problem_id": session.problem_id,
-                "difficulty": session.difficulty,
-                "status": session.status,
-                "score": session.final_score,
-                "started_at": session.started_at.timestamp() if session.started_at else None,
-                "completed_at": session.completed_at.timestamp() if session.completed_at else None,
-                "time_spent": session.time_spent
-            })
+        # A short page is the last one
+        next_cursor = _encode_history_cursor(sessions[-1]) if sessions and len(sessions) == limit else None
         
-        return {"sessions": session_history, "user_type": "authenticated"}
+        return {"sessions": session_history, "user_type": "authenticated", "next_cursor": next_cursor}
     
     elif guest_id:
         # Guest user - get from guest service
@@ -206,3 +188,32 @@ async def get_session_history(
             "user_type": "anonymous",
             "message": "Session history requires authentication or guest session"
         }
+
+
+def _encode_history_cursor(session) -> str:
+    """Opaque page token for the (started_at, id) keyset of a history row"""
+    started_at = session.started_at.isoformat() if session.started_at else None
+    return base64.urlsafe_b64encode(orjson.dumps([started_at, session.id])).decode()
+
+
+def _decode_history_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Parse a token from _encode_history_cursor back into its keyset"""
+    try:
+        started_at, session_id = orjson.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(started_at), session_id
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def history_entry(session) -> dict:
+    """Format a GameSessionCRUD.get_recent_sessions row for session history"""
+    return {
+        "session_id": session.session_id,
+        "problem_id": session.problem_id,
+        "difficulty": session.difficulty,
+        "status": session.status,
+        "score": session.final_score,
+        "started_at": session.started_at.timestamp() if session.started_at else None,
+        "completed_at": session.completed_at.timestamp() if session.completed_at else None,
+        "time_spent": session.time_spent
+    }
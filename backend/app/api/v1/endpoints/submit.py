@@ -2,19 +2,30 @@
 Code submission and evaluation endpoints with database persistence
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
+import logging
 import time
+from bisect import bisect_right
+from datetime import datetime
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db
 from app.db.crud import GameSessionCRUD, SubmissionCRUD, ProblemCRUD, UserCRUD, BadgeCRUD
 from app.services.problem_service import problem_service
+from app.services.auth_service import AuthService
+from app.services.badge_service import BadgeService
+from app.services.leaderboard_service import LeaderboardService
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
 class BugReport(BaseModel):
+    # Only read after validation; unknown keys are dropped without building extras
+    model_config = ConfigDict(extra='ignore', frozen=True)
+    
     line_number: int
     description: Optional[str] = None
 
@@ -40,8 +51,17 @@ class SubmissionResponse(BaseModel):
 
 
 @router.post("/", response_model=SubmissionResponse)
-async def submit_solution(request: SubmissionRequest, db: Session = Depends(get_db)):
-    """Submit bug findings for evaluation with support for anonymous, guest, and authenticated users"""
+def submit_solution(
+    request: SubmissionRequest,
+    background_tasks: BackgroundTasks,
+    verbose: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Submit bug findings for evaluation with support for anonymous, guest, and authenticated users
+    
+    ``verbose=false`` returns only the scoring; the explanation is empty and
+    no per-bug feedback is built or stored.
+    """
     
     # Try to get session from database (for authenticated users)
     session = GameSessionCRUD.get_session_by_id(db, request.session_id)
@@ -58,67 +78,73 @@ async def submit_solution(request: SubmissionRequest, db: Session = Depends(get_
         raise HTTPException(status_code=400, detail="Problem ID is required for anonymous sessions")
     
     # Get problem data from database first, fallback to problem service
-    db_problem = ProblemCRUD.get_problem_by_id(db, problem_id)
+    problem = problem_service.get_db_problem(db, problem_id)
     
-    if db_problem:
-        problem = {
-            'id': db_problem.id,
-            'title': db_problem.title,
-            'category': db_problem.category,
-            'bugs': db_problem.bugs
-        }
-    else:
+    if not problem:
         # Fallback to problem service
         problem = problem_service.get_problem_by_id(problem_id)
         if not problem:
             raise HTTPException(status_code=404, detail="Problem not found")
     
-    # Extract correct bug line numbers from problem data
-    correct_bugs = [bug['line_number'] for bug in problem['bugs']]
-    submitted_lines = [bug.line_number for bug in request.bugs]
+    # Correct bug lines are precomputed when the problem is loaded
+    total_bugs = len(problem['bugs'])
+    correct_lines = problem['_correct_lines']
+    
+    # One pass over the report: the DB payload plus the first report per line
+    bugs_reported = []
+    submitted_by_line = {}
+    for bug in request.bugs:
+        bugs_reported.append({"line_number": bug.line_number, "description": bug.description})
+        submitted_by_line.setdefault(bug.line_number, bug)
+    submitted_lines = submitted_by_line.keys()
     
-    # Calculate results
-    correct_bugs_found = [line for line in submitted_lines if line in correct_bugs]
-    missed_bugs = [line for line in correct_bugs if line not in submitted_lines]
-    false_positives = [line for line in submitted_lines if line not in correct_bugs]
+    # Calculate results (a line reported twice only counts once)
+    correct_bugs_found = sorted(correct_lines & submitted_lines)
+    missed_bugs = sorted(correct_lines - submitted_lines)
+    false_positives = sorted(submitted_lines - correct_lines)
     
     # Calculate score
     base_score = 100
-    correct_points = len(correct_bugs_found) * (base_score // len(correct_bugs)) if correct_bugs else 0
+    correct_points = len(correct_bugs_found) * (base_score // total_bugs) if total_bugs else 0
     penalty = len(false_positives) * 10
     score = max(0, correct_points - penalty)
     
-    # Generate detailed feedback
-    detailed_feedback = _generate_detailed_feedback(
-        problem, correct_bugs_found, missed_bugs, false_positives, request.bugs
-    )
-    
-    # Generate explanation
-    explanation = _generate_explanation(
-        problem, len(correct_bugs_found), len(correct_bugs), 
-        len(missed_bugs), len(false_positives), correct_points, penalty, score, base_score
-    )
+    if verbose:
+        # Generate detailed feedback
+        detailed_feedback = _generate_detailed_feedback(
+            problem, correct_bugs_found, missed_bugs, false_positives, submitted_by_line
+        )
+        
+        # Generate explanation
+        explanation = _generate_explanation(
+            problem, len(correct_bugs_found), total_bugs, 
+            len(missed_bugs), len(false_positives), correct_points, penalty, score, base_score
+        )
+    else:
+        detailed_feedback = []
+        explanation = ""
     
     # Calculate time spent (only for authenticated sessions)
     time_spent = 0
     if session and session.started_at:
         time_spent = int(time.time() - session.started_at.timestamp())
     
-    # Save submission to database (only for authenticated users)
+    # Save submission to database (only for authenticated users). Every write
+    # below only flushes; the whole submission is committed once at the end.
     if session:
         submission_data = {
             "session_id": session.id,
             "user_id": session.user_id,
-            "bugs_reported": [{"line_number": bug.line_number, "description": bug.description} for bug in request.bugs],
+            "bugs_reported": bugs_reported,
             "score": score,
             "max_score": base_score,
             "correct_bugs": correct_bugs_found,
             "missed_bugs": missed_bugs,
             "false_positives": false_positives,
-            "detailed_feedback": detailed_feedback
+            "detailed_feedback": detailed_feedback if verbose else None
         }
         
-        submission = SubmissionCRUD.create_submission(db, submission_data)
+        submission = SubmissionCRUD.create_submission(db, submission_data, commit=False)
         
         # Complete the session
         session_results = {
@@ -130,10 +156,11 @@ async def submit_solution(request: SubmissionRequest, db: Session = Depends(get_
             "time_spent": time_spent
         }
         
-        GameSessionCRUD.complete_session(db, request.session_id, session_results)
+        GameSessionCRUD.complete_session(db, request.session_id, session_results, commit=False)
         
-        # Update problem statistics
-        ProblemCRUD.update_problem_stats(db, problem_id, score)
+        # Problem-wide counters are not part of the response; update them after
+        # it is sent so submissions for the same problem don't queue on its row
+        background_tasks.add_task(_record_problem_attempt, problem_id, score)
         
         # Update user statistics and check for badges
         badges_earned = []
@@ -146,13 +173,24 @@ async def submit_solution(request: SubmissionRequest, db: Session = Depends(get_
                 "best_score": user_stats["best_score"],
                 "total_bugs_found": user_stats["total_bugs_found"],
                 "accuracy_rate": user_stats["accuracy_rate"],
-                "last_login": time.time()
+                "last_login": datetime.utcnow()
             }
             
-            UserCRUD.update_user_stats(db, session.user_id, stats_update)
+            UserCRUD.update_user_stats(db, session.user_id, stats_update, commit=False)
             
             # Check for new badges
-            badges_earned = _check_and_award_badges(db, session.user_id, score, user_stats)
+            badges_earned = _check_and_award_badges(db, session.user_id)
+        
+        db.commit()
+        
+        # Drop cached views only once the new data is visible to other sessions.
+        # The submission is already committed, so a failure here must not fail it.
+        try:
+            LeaderboardService.record_score(session.difficulty, score)
+            if session.user_id:
+                AuthService.invalidate_user(session.user_id)
+        except Exception as e:
+            logger.error("Error invalidating cached views after submit: %s", e)
     else:
         # Anonymous/guest session - no database persistence
         badges_earned = []
@@ -172,13 +210,25 @@ async def submit_solution(request: SubmissionRequest, db: Session = Depends(get_
     )
 
 
-def _generate_detailed_feedback(problem, correct_bugs_found, missed_bugs, false_positives, submitted_bugs):
+def _record_problem_attempt(problem_id: str, score: int):
+    """Update problem statistics in a session of its own, after the response"""
+    db = SessionLocal()
+    try:
+        ProblemCRUD.update_problem_stats(db, problem_id, score)
+    finally:
+        db.close()
+
+
+def _generate_detailed_feedback(problem, correct_bugs_found, missed_bugs, false_positives, submitted_by_line):
     """Generate detailed feedback for each bug"""
     feedback = []
     
+    # Both sides are already indexed by line, keeping the first entry for each
+    bugs_by_line = problem['_bugs_by_line']
+    
     # Feedback for correct bugs found
     for line_num in correct_bugs_found:
-        bug_info = next((bug for bug in problem['bugs'] if bug['line_number'] == line_num), None)
+        bug_info = bugs_by_line.get(line_num)
         if bug_info:
             feedback.append({
                 "line_number": line_num,
@@ -191,7 +241,7 @@ def _generate_detailed_feedback(problem, correct_bugs_found, missed_bugs, false_
     
     # Feedback for missed bugs
     for line_num in missed_bugs:
-        bug_info = next((bug for bug in problem['bugs'] if bug['line_number'] == line_num), None)
+        bug_info = bugs_by_line.get(line_num)
         if bug_info:
             feedback.append({
                 "line_number": line_num,
@@ -205,7 +255,7 @@ def _generate_detailed_feedback(problem, correct_bugs_found, missed_bugs, false_
     
     # Feedback for false positives
     for line_num in false_positives:
-        submitted_bug = next((bug for bug in submitted_bugs if bug.line_number == line_num), None)
+        submitted_bug = submitted_by_line.get(line_num)
         feedback.append({
             "line_number": line_num,
             "status": "false_positive",
@@ -217,82 +267,103 @@ def _generate_detailed_feedback(problem, correct_bugs_found, missed_bugs, false_
     return feedback
 
 
+# Fixed parts of the submission explanation; only the per-bug-type section
+# in between varies in length.
+_EXPLANATION_HEADER = (
+    "🎯 **{title} - Analysis Results**\n"
+    "**Problem Category:** {category}\n"
+    "\n"
+    "**Bugs Found:** {correct_count}/{total_bugs}"
+)
+
+_EXPLANATION_SUMMARY = (
+    "\n"
+    "**Performance Summary:**\n"
+    "  - Correct identifications: {correct_count}\n"
+    "  - Missed bugs: {missed_count}\n"
+    "  - False positives: {false_positive_count}\n"
+    "\n"
+    "**Score Calculation:**\n"
+    "  - Base points: {correct_points} (correct bugs × {points_per_bug})\n"
+    "  - Penalty: -{penalty} (false positives × 10)\n"
+    "  - Final score: {score}/{max_score}\n"
+    "\n"
+    "**Overall Rating:** {rating} ({percentage:.1f}%)"
+)
+
+# Lower bounds (inclusive) of each rating above the first, by score percentage
+_RATING_THRESHOLDS = (50, 70, 90)
+_RATINGS = (
+    "💪 Room for improvement!",
+    "📈 Keep practicing!",
+    "👍 Good job!",
+    "🏆 Excellent!",
+)
+
+
 def _generate_explanation(problem, correct_count, total_bugs, missed_count, false_positive_count, 
                          correct_points, penalty, score, max_score):
     """Generate comprehensive explanation"""
     
     explanation_parts = [
-        f"🎯 **{problem['title']} - Analysis Results**",
-        f"**Problem Category:** {problem['category'].replace('_', ' ').title()}",
-        "",
-        f"**Bugs Found:** {correct_count}/{total_bugs}",
+        _EXPLANATION_HEADER.format_map({
+            "title": problem['title'],
+            "category": problem['category'].replace('_', ' ').title(),
+            "correct_count": correct_count,
+            "total_bugs": total_bugs,
+        })
     ]
     
     # Add details about each bug type
-    bug_types = {}
-    for bug in problem['bugs']:
-        bug_type = bug['type'].replace('_', ' ').title()
-        if bug_type not in bug_types:
-            bug_types[bug_type] = []
-        bug_types[bug_type].append(f"Line {bug['line_number']}: {bug['description']}")
-    
-    for bug_type, bugs in bug_types.items():
-        explanation_parts.append(f"**{bug_type} Issues:**")
-        for bug in bugs:
-            explanation_parts.append(f"  - {bug}")
-    
-    explanation_parts.extend([
-        "",
-        f"**Performance Summary:**",
-        f"  - Correct identifications: {correct_count}",
-        f"  - Missed bugs: {missed_count}",
-        f"  - False positives: {false_positive_count}",
-        "",
-        f"**Score Calculation:**",
-        f"  - Base points: {correct_points} (correct bugs × {100//total_bugs if total_bugs else 0})",
-        f"  - Penalty: -{penalty} (false positives × 10)",
-        f"  - Final score: {score}/{max_score}",
-    ])
+    if problem['_bugs_section']:
+        explanation_parts.append(problem['_bugs_section'])
     
     # Add performance rating
     percentage = (score / max_score) * 100 if max_score > 0 else 0
-    if percentage >= 90:
-        rating = "🏆 Excellent!"
-    elif percentage >= 70:
-        rating = "👍 Good job!"
-    elif percentage >= 50:
-        rating = "📈 Keep practicing!"
-    else:
-        rating = "💪 Room for improvement!"
+    rating = _RATINGS[bisect_right(_RATING_THRESHOLDS, percentage)]
     
-    explanation_parts.extend([
-        "",
-        f"**Overall Rating:** {rating} ({percentage:.1f}%)"
-    ])
+    explanation_parts.append(_EXPLANATION_SUMMARY.format_map({
+        "correct_count": correct_count,
+        "missed_count": missed_count,
+        "false_positive_count": false_positive_count,
+        "correct_points": correct_points,
+        "points_per_bug": 100 // total_bugs if total_bugs else 0,
+        "penalty": penalty,
+        "score": score,
+        "max_score": max_score,
+        "rating": rating,
+        "percentage": percentage,
+    }))
     
     return "\n".join(explanation_parts)
 
 
-def _check_and_award_badges(db: Session, user_id: str, score: int, max_score: int, problem: dict) -> List[dict]:
+def _check_and_award_badges(db: Session, user_id: str) -> List[dict]:
     """Check badge eligibility and award new badges"""
     badges_earned = []
-    all_badges = BadgeCRUD.get_all_badges(db)
+    all_badges = BadgeService.get_active_badges(db)
+    
+    # Load the user's badges, row and badge progress once for every badge checked below
+    existing_badge_ids = {ub.badge_id for ub in BadgeCRUD.get_user_badges(db, user_id)}
+    user = UserCRUD.get_user_by_id(db, user_id)
+    if not user:
+        return badges_earned
+    progress = BadgeCRUD.get_badge_progress(db, user_id)
     
     for badge in all_badges:
         # Check if user already has this badge
-        existing_badges = BadgeCRUD.get_user_badges(db, user_id)
-        if any(ub.badge_id == badge.id for ub in existing_badges):
+        if badge['id'] in existing_badge_ids:
             continue
         
         # Check eligibility
-        if BadgeCRUD.check_badge_eligibility(db, user_id, badge.requirements):
+        if BadgeCRUD.check_badge_eligibility(db, user_id, badge['requirements'], user=user, progress=progress):
             # Award the badge
-            user_badge = BadgeCRUD.award_badge(db, user_id, badge.id)
+            user_badge = BadgeCRUD.award_badge(db, user_id, badge['id'], commit=False)
             badges_earned.append({
-                "id": badge.id,
-                "name": badge.name,
-                "description": badge.description,
-                "icon": badge.icon,
+                "id": badge['id'],
+                "name": badge['name'],
+                "description": badge['description'],
+                "icon": badge['icon'],
                 "earned_at": user_badge.earned_at.timestamp()
             })
     
@@ -2,38 +2,101 @@
 Logging configuration
 """
 
+import orjson
+import queue
 import structlog
 import logging
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 from app.core.config import settings
 
+# Loggers only enqueue records; the stdout writes happen on a listener thread
+# started with the app. Records logged before it starts wait in the queue.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+
+
+def _orjson_dumps(obj, **kwargs) -> str:
+    return orjson.dumps(obj, **kwargs).decode()
+
+
+class _QueueLogger:
+    """structlog logger that hands rendered lines to the log queue"""
+    
+    def __init__(self, name: str):
+        self.name = name  # read by structlog.stdlib.add_logger_name
+    
+    def msg(self, message: str) -> None:
+        # structlog has already filtered by level, so the record only carries the line
+        _log_queue.put(logging.makeLogRecord({"msg": message, "levelno": logging.NOTSET}))
+    
+    log = debug = info = warn = warning = error = err = critical = exception = fatal = failure = msg
+
+
+_queue_loggers: Dict[str, _QueueLogger] = {}
+
+
+def _queue_logger_factory(*args) -> _QueueLogger:
+    """Logger named by structlog.get_logger(name); unnamed loggers are "root" as in stdlib"""
+    name = args[0] if args else "root"
+    logger = _queue_loggers.get(name)
+    if logger is None:
+        logger = _queue_loggers.setdefault(name, _QueueLogger(name))
+    return logger
+
 
 def setup_logging():
     """Setup structured logging"""
     
-    # Configure standard library logging
+    level = getattr(logging, settings.LOG_LEVEL.upper())
+    
+    # Standard library logging is only used by third-party and script loggers
     logging.basicConfig(
         format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, settings.LOG_LEVEL.upper()),
+        handlers=[QueueHandler(_log_queue)],
+        level=level,
     )
     
-    # Configure structlog
+    # Configure structlog. Application logs bypass the stdlib logging
+    # machinery: the level check happens in the bound logger and the rendered
+    # line goes straight onto the log queue.
+    processors = [
+        structlog.stdlib.add_logger_name,
+        structlog.processors.add_log_level,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.StackInfoRenderer(),
+        structlog.processors.format_exc_info,
+        structlog.processors.UnicodeDecoder(),
+    ]
+    if settings.LOG_FORMAT == "json":
+        processors.append(structlog.processors.JSONRenderer(serializer=_orjson_dumps))
+    else:
+        processors.append(structlog.dev.ConsoleRenderer())
+    
     structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer() if settings.LOG_FORMAT == "json" 
-            else structlog.dev.ConsoleRenderer(),
-        ],
+        processors=processors,
         context_class=dict,
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=_queue_logger_factory,
+        wrapper_class=structlog.make_filtering_bound_logger(level),
         cache_logger_on_first_use=True,
     )
+
+
+def start_log_listener():
+    """Start the thread that writes queued log records to stdout"""
+    global _listener
+    if _listener is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _listener = QueueListener(_log_queue, handler, respect_handler_level=True)
+        _listener.start()
+
+
+def stop_log_listener():
+    """Flush the log queue and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
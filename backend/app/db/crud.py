@@ -2,14 +2,56 @@
 CRUD operations for database models
 """
 
-from typing import List, Optional, Dict, Any
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_
+from sqlalchemy import DateTime, bindparam, desc, func, and_, insert, select, text, tuple_, update
 from datetime import datetime, timedelta
 from app.db.models import (
-    User, Problem, GameSession, Submission, Badge, UserBadge, Leaderboard
+    User, Problem, GameSession, Submission, Badge, UserBadge, Leaderboard, keyset_timestamp
 )
 
+# Hot single-row lookups, built once so every call hits the compiled-statement cache
+_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+_SESSION_BY_SESSION_ID = select(GameSession).where(GameSession.session_id == bindparam("session_id"))
+_USER_BADGE = select(UserBadge).where(
+    UserBadge.user_id == bindparam("user_id"), UserBadge.badge_id == bindparam("badge_id")
+)
+_PERFECT_SCORE_COUNT = select(func.count(Submission.id)).where(
+    Submission.user_id == bindparam("user_id"), Submission.score == Submission.max_score
+)
+
+
+# Columns the user update helpers may write
+_USER_STATS_FIELDS = frozenset({
+    "total_sessions", "total_score", "best_score", "total_bugs_found", "accuracy_rate", "last_login"
+})
+_USER_PROFILE_FIELDS = frozenset({"display_name", "avatar_url"})
+
+
+def insert_on_conflict(db: Session, model):
+    """INSERT for ``model`` that supports ON CONFLICT, or None on other backends"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    return None
+
+
+def _keyset_page(query, timestamp_column, id_column, before: Optional[Tuple[datetime, str]]):
+    """Order ``query`` newest first and keep only rows before a ``(timestamp, id)`` key
+    
+    Keyset paging: the id breaks timestamp ties, so no row is skipped or
+    repeated, and later pages cost the same as the first.
+    """
+    timestamp = keyset_timestamp(timestamp_column)
+    if before is not None:
+        before_timestamp, before_id = before
+        query = query.filter(tuple_(timestamp, id_column) < tuple_(keyset_timestamp(before_timestamp), before_id))
+    return query.order_by(desc(timestamp), desc(id_column))
+
 
 # User CRUD operations
 class UserCRUD:
@@ -29,55 +71,52 @@ class UserCRUD:
     
     @staticmethod
     def get_user_by_id(db: Session, user_id: str) -> Optional[User]:
-        """Get user by ID"""
-        return db.query(User).filter(User.id == user_id).first()
+        """Get user by ID (from the identity map when already loaded)"""
+        return db.get(User, user_id)
     
     @staticmethod
     def get_user_by_username(db: Session, username: str) -> Optional[User]:
         """Get user by username"""
-        return db.query(User).filter(User.username == username).first()
+        return db.execute(_USER_BY_USERNAME, {"username": username}).scalar_one_or_none()
     
     @staticmethod
     def get_user_by_email(db: Session, email: str) -> Optional[User]:
         """Get user by email"""
-        return db.query(User).filter(User.email == email).first()
+        return db.execute(_USER_BY_EMAIL, {"email": email}).scalar_one_or_none()
     
     @staticmethod
-    def update_user_stats(db: Session, user_id: str, stats_update: Dict[str, Any]) -> User:
-        """Update user statistics"""
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            for key, value in stats_update.items():
-                if hasattr(user, key):
-                    setattr(user, key, value)
-            user.updated_at = datetime.utcnow()
-            db.commit()
-            db.refresh(user)
-        return user
+    def update_user_stats(db: Session, user_id: str, stats_update: Dict[str, Any], commit: bool = True) -> bool:
+        """Update user statistics in one UPDATE; returns whether the user exists
+        
+        ``commit=False`` leaves the statement in the caller's open transaction.
+        """
+        values = {key: value for key, value in stats_update.items() if key in _USER_STATS_FIELDS}
+        return UserCRUD._update_user(db, user_id, values, commit)
+    
+    @staticmethod
+    def update_user_profile(db: Session, user_id: str, profile_data: Dict[str, Any]) -> bool:
+        """Update user profile information in one UPDATE; returns whether the user exists"""
+        values = {key: value for key, value in profile_data.items() if key in _USER_PROFILE_FIELDS}
+        return UserCRUD._update_user(db, user_id, values, commit=True)
     
     @staticmethod
-    def update_user_profile(db: Session, user_id: str, profile_data: Dict[str, Any]) -> User:
-        """Update user profile information"""
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            allowed_fields = ['display_name', 'avatar_url']
-            for key, value in profile_data.items():
-                if key in allowed_fields and hasattr(user, key):
-                    setattr(user, key, value)
-            user.updated_at = datetime.utcnow()
+    def _update_user(db: Session, user_id: str, values: Dict[str, Any], commit: bool) -> bool:
+        """Write whitelisted columns without loading the row first"""
+        values["updated_at"] = datetime.utcnow()
+        # Plain values, so a User already loaded in this session is updated in place
+        result = db.execute(update(User).where(User.id == user_id).values(**values))
+        if commit:
             db.commit()
-            db.refresh(user)
-        return user
+        return result.rowcount > 0
 
 
 # Problem CRUD operations
 class ProblemCRUD:
     @staticmethod
     def get_problem_by_id(db: Session, problem_id: str) -> Optional[Problem]:
-        """Get problem by ID"""
-        return db.query(Problem).filter(
-            and_(Problem.id == problem_id, Problem.is_active == True)
-        ).first()
+        """Get an active problem by ID"""
+        problem = db.get(Problem, problem_id)
+        return problem if problem and problem.is_active else None
     
     @staticmethod
     def get_problems_by_difficulty(db: Session, difficulty: str) -> List[Problem]:
@@ -99,19 +138,21 @@ class ProblemCRUD:
         return db.query(Problem).filter(Problem.is_active == True).all()
     
     @staticmethod
-    def update_problem_stats(db: Session, problem_id: str, score: int):
-        """Update problem statistics after a submission"""
-        problem = db.query(Problem).filter(Problem.id == problem_id).first()
-        if problem:
-            problem.total_attempts += 1
-            if score > 0:
-                problem.total_completions += 1
-            
-            # Update average score
-            if problem.total_attempts > 0:
-                current_total = problem.average_score * (problem.total_attempts - 1)
-                problem.average_score = (current_total + score) / problem.total_attempts
-            
+    def update_problem_stats(db: Session, problem_id: str, score: int, commit: bool = True):
+        """Update problem statistics after a submission, as one atomic UPDATE"""
+        # Every right-hand side reads the pre-update row, so concurrent
+        # submissions can't lose each other's increments
+        db.execute(
+            update(Problem)
+            .where(Problem.id == problem_id)
+            .values(
+                total_attempts=Problem.total_attempts + 1,
+                total_completions=Problem.total_completions + (1 if score > 0 else 0),
+                average_score=(Problem.average_score * Problem.total_attempts + score) / (Problem.total_attempts + 1),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if commit:
             db.commit()
 
 
@@ -129,19 +170,102 @@ class GameSessionCRUD:
     @staticmethod
     def get_session_by_id(db: Session, session_id: str) -> Optional[GameSession]:
         """Get session by session_id"""
-        return db.query(GameSession).filter(GameSession.session_id == session_id).first()
+        return db.execute(_SESSION_BY_SESSION_ID, {"session_id": session_id}).scalar_one_or_none()
+    
+    @staticmethod
+    def get_user_sessions(
+        db: Session, user_id: str, limit: int = 10, before: Optional[Tuple[datetime, str]] = None
+    ) -> List[GameSession]:
+        """Get user's recent sessions, optionally only those before a ``(started_at, id)`` key"""
+        query = db.query(GameSession).filter(GameSession.user_id == user_id)
+        return _keyset_page(query, GameSession.started_at, GameSession.id, before).limit(limit).all()
     
     @staticmethod
-    def get_user_sessions(db: Session, user_id: str, limit: int = 10) -> List[GameSession]:
-        """Get user's recent sessions"""
-        return db.query(GameSession).filter(
+    def get_recent_sessions(
+        db: Session, user_id: str, limit: int = 10, before: Optional[Tuple[datetime, str]] = None
+    ) -> List[Any]:
+        """Get lightweight rows for a user's most recent sessions, optionally before a ``(started_at, id)`` key"""
+        # Plain column rows: the history views never need full GameSession objects
+        query = db.query(
+            GameSession.id,
+            GameSession.session_id,
+            GameSession.problem_id,
+            GameSession.difficulty,
+            GameSession.status,
+            GameSession.final_score,
+            GameSession.started_at,
+            GameSession.completed_at,
+            GameSession.time_spent,
+        ).filter(GameSession.user_id == user_id)
+        return _keyset_page(query, GameSession.started_at, GameSession.id, before).limit(limit).all()
+    
+    @staticmethod
+    def get_user_stats(db: Session, user_id: str) -> Dict[str, Any]:
+        """Aggregate a user's session totals and per-difficulty counts in SQL"""
+        total_sessions, total_score, best_score, avg_time_spent = db.query(
+            func.count(GameSession.id),
+            func.coalesce(func.sum(GameSession.final_score), 0),
+            func.coalesce(func.max(GameSession.final_score), 0),
+            # Sessions without a recorded duration do not count toward the average
+            func.avg(func.nullif(GameSession.time_spent, 0)),
+        ).filter(GameSession.user_id == user_id).one()
+        
+        by_difficulty: Dict[str, Dict[str, int]] = {}
+        completed_sessions = 0
+        first_completed_at = None
+        rows = db.query(
+            GameSession.difficulty,
+            GameSession.status,
+            func.count(GameSession.id),
+            func.min(GameSession.completed_at),
+        ).filter(
             GameSession.user_id == user_id
-        ).order_by(desc(GameSession.started_at)).limit(limit).all()
+        ).group_by(GameSession.difficulty, GameSession.status).all()
+        for difficulty, status, count, earliest_completed_at in rows:
+            entry = by_difficulty.setdefault(difficulty, {"played": 0, "completed": 0})
+            entry["played"] += count
+            if status == "completed":
+                entry["completed"] += count
+                completed_sessions += count
+                if earliest_completed_at and (first_completed_at is None or earliest_completed_at < first_completed_at):
+                    first_completed_at = earliest_completed_at
+        
+        return {
+            "total_sessions": total_sessions,
+            "completed_sessions": completed_sessions,
+            "total_score": int(total_score),
+            "best_score": int(best_score),
+            "average_time_spent": float(avg_time_spent or 0),
+            "by_difficulty": by_difficulty,
+            "first_completed_at": first_completed_at,
+        }
+    
+    @staticmethod
+    def get_leaderboard(db: Session, limit: int = 10, difficulty: Optional[str] = None) -> List[Any]:
+        """Get ranked top completed sessions of users with a username"""
+        ordering = (desc(GameSession.final_score), GameSession.completed_at)
+        query = db.query(
+            func.row_number().over(order_by=ordering).label("rank"),
+            User.username,
+            GameSession.final_score,
+            GameSession.difficulty,
+            GameSession.time_spent,
+            GameSession.completed_at,
+        ).join(User, GameSession.user_id == User.id).filter(
+            and_(
+                GameSession.status == "completed",
+                GameSession.final_score.isnot(None),
+                User.username.isnot(None)
+            )
+        )
+        if difficulty:
+            query = query.filter(GameSession.difficulty == difficulty)
+        return query.order_by(*ordering).limit(limit).all()
     
     @staticmethod
-    def complete_session(db: Session, session_id: str, results: Dict[str, Any]) -> GameSession:
+    def complete_session(db: Session, session_id: str, results: Dict[str, Any], commit: bool = True) -> GameSession:
         """Mark session as completed with results"""
-        session = db.query(GameSession).filter(GameSession.session_id == session_id).first()
+        session = db.execute(_SESSION_BY_SESSION_ID, {"session_id": session_id}).scalar_one_or_none()
         if session:
             session.status = "completed"
             session.completed_at = datetime.utcnow()
@@ -151,35 +275,71 @@ class GameSessionCRUD:
             session.bugs_found = results.get('bugs_found')
             session.bugs_missed = results.get('bugs_missed')
             session.false_positives = results.get('false_positives')
-            db.commit()
-            db.refresh(session)
+            if commit:
+                db.commit()
+                db.refresh(session)
+            else:
+                db.flush()
         return session
 
 
 # Submission CRUD operations
 class SubmissionCRUD:
     @staticmethod
-    def create_submission(db: Session, submission_data: Dict[str, Any]) -> Submission:
+    def create_submission(db: Session, submission_data: Dict[str, Any], commit: bool = True) -> Submission:
         """Create a new submission"""
         submission = Submission(**submission_data)
         db.add(submission)
-        db.commit()
-        db.refresh(submission)
+        if commit:
+            db.commit()
+            db.refresh(submission)
+        else:
+            db.flush()
         return submission
     
     @staticmethod
-    def get_user_submissions(db: Session, user_id: str, limit: int = 10) -> List[Submission]:
-        """Get user's recent submissions"""
-        return db.query(Submission).filter(
+    def create_submissions_bulk(db: Session, submissions_data: List[Dict[str, Any]], commit: bool = True) -> int:
+        """Insert many submissions in one executemany round trip"""
+        if not submissions_data:
+            return 0
+        # ORM bulk INSERT: batched into multi-row VALUES by the driver, no
+        # per-object identity-map bookkeeping
+        db.execute(insert(Submission), submissions_data)
+        if commit:
+            db.commit()
+        return len(submissions_data)
+    
+    @staticmethod
+    def get_user_submissions(
+        db: Session, user_id: str, limit: int = 10, before: Optional[Tuple[datetime, str]] = None
+    ) -> List[Submission]:
+        """Get user's recent submissions, optionally only those before a ``(submitted_at, id)`` key"""
+        query = db.query(Submission).filter(Submission.user_id == user_id)
+        return _keyset_page(query, Submission.submitted_at, Submission.id, before).limit(limit).all()
+    
+    @staticmethod
+    def stream_user_submissions(db: Session, user_id: str, batch_size: int = 1000) -> Iterator[Submission]:
+        """Iterate over all of a user's submissions, newest first, in fixed-size batches"""
+        # yield_per keeps memory bounded by batch_size however long the history is
+        stmt = select(Submission).where(
             Submission.user_id == user_id
-        ).order_by(desc(Submission.submitted_at)).limit(limit).all()
+        ).order_by(desc(Submission.submitted_at), desc(Submission.id)).execution_options(yield_per=batch_size)
+        yield from db.scalars(stmt)
     
     @staticmethod
     def get_submission_stats(db: Session, user_id: str) -> Dict[str, Any]:
-        """Get user's submission statistics"""
-        submissions = db.query(Submission).filter(Submission.user_id == user_id).all()
+        """Aggregate a user's submission statistics in SQL, without loading the rows"""
+        bugs_found = func.json_array_length(Submission.correct_bugs)
+        bugs_missed = func.json_array_length(Submission.missed_bugs)
+        total_submissions, total_score, best_score, total_bugs_found, total_possible_bugs = db.query(
+            func.count(Submission.id),
+            func.coalesce(func.sum(Submission.score), 0),
+            func.coalesce(func.max(Submission.score), 0),
+            func.coalesce(func.sum(bugs_found), 0),
+            func.coalesce(func.sum(bugs_found + bugs_missed), 0),
+        ).filter(Submission.user_id == user_id).one()
         
-        if not submissions:
+        if not total_submissions:
             return {
                 "total_submissions": 0,
                 "average_score": 0.0,
@@ -188,15 +348,11 @@ class SubmissionCRUD:
                 "accuracy_rate": 0.0
             }
         
-        total_score = sum(s.score for s in submissions)
-        total_bugs_found = sum(len(s.correct_bugs) for s in submissions)
-        total_possible_bugs = sum(len(s.correct_bugs) + len(s.missed_bugs) for s in submissions)
-        
         return {
-            "total_submissions": len(submissions),
-            "average_score": total_score / len(submissions),
-            "best_score": max(s.score for s in submissions),
-            "total_bugs_found": total_bugs_found,
+            "total_submissions": total_submissions,
+            "average_score": total_score / total_submissions,
+            "best_score": best_score,
+            "total_bugs_found": int(total_bugs_found),
             "accuracy_rate": total_bugs_found / total_possible_bugs if total_possible_bugs > 0 else 0.0
         }
 
@@ -214,125 +370,206 @@ class BadgeCRUD:
         return db.query(UserBadge).filter(UserBadge.user_id == user_id).all()
     
     @staticmethod
-    def award_badge(db: Session, user_id: str, badge_id: str) -> UserBadge:
-        """Award a badge to a user"""
-        # Check if user already has this badge
-        existing = db.query(UserBadge).filter(
-            and_(UserBadge.user_id == user_id, UserBadge.badge_id == badge_id)
-        ).first()
+    def award_badge(db: Session, user_id: str, badge_id: str, commit: bool = True) -> UserBadge:
+        """Award a badge to a user, returning the existing row if already earned"""
+        stmt = insert_on_conflict(db, UserBadge)
+        if stmt is not None:
+            # One round trip; concurrent awards of the same badge can't duplicate it
+            user_badge = db.scalars(
+                stmt.values(user_id=user_id, badge_id=badge_id)
+                .on_conflict_do_nothing(index_elements=["user_id", "badge_id"])
+                .returning(UserBadge)
+            ).first()
+        else:
+            user_badge = None
+            if db.execute(_USER_BADGE, {"user_id": user_id, "badge_id": badge_id}).scalar_one_or_none() is None:
+                user_badge = UserBadge(user_id=user_id, badge_id=badge_id)
+                db.add(user_badge)
+                db.flush()
         
-        if existing:
-            return existing
-        
-        user_badge = UserBadge(user_id=user_id, badge_id=badge_id)
-        db.add(user_badge)
-        db.commit()
-        db.refresh(user_badge)
+        if user_badge is None:
+            user_badge = db.execute(_USER_BADGE, {"user_id": user_id, "badge_id": badge_id}).scalar_one()
+        if commit:
+            db.commit()
         return user_badge
     
     @staticmethod
-    def check_badge_eligibility(db: Session, user_id: str, badge_requirements: Dict[str, Any]) -> bool:
-        """Check if user meets badge requirements"""
-        user_stats = SubmissionCRUD.get_submission_stats(db, user_id)
-        user = UserCRUD.get_user_by_id(db, user_id)
+    def get_badge_progress(db: Session, user_id: str) -> Dict[str, Any]:
+        """Aggregate everything badge requirements count beyond the user row"""
+        perfect_scores = db.execute(_PERFECT_SCORE_COUNT, {"user_id": user_id}).scalar_one()
+        
+        # Completed sessions grouped once by category and difficulty; any
+        # category- or difficulty-based requirement is a lookup in these dicts
+        completed_by_category: Dict[str, int] = {}
+        completed_by_difficulty: Dict[str, int] = {}
+        fastest_completion = None
+        rows = db.query(
+            Problem.category,
+            GameSession.difficulty,
+            func.count(GameSession.id),
+            func.min(GameSession.time_spent),
+        ).select_from(GameSession).outerjoin(
+            Problem, GameSession.problem_id == Problem.id
+        ).filter(
+            GameSession.user_id == user_id, GameSession.status == "completed"
+        ).group_by(Problem.category, GameSession.difficulty).all()
+        for category, difficulty, count, fastest in rows:
+            if category is not None:
+                completed_by_category[category] = completed_by_category.get(category, 0) + count
+            completed_by_difficulty[difficulty] = completed_by_difficulty.get(difficulty, 0) + count
+            if fastest is not None and (fastest_completion is None or fastest < fastest_completion):
+                fastest_completion = fastest
+        
+        return {
+            "perfect_scores": perfect_scores,
+            "completed_by_category": completed_by_category,
+            "completed_by_difficulty": completed_by_difficulty,
+            "fastest_completion": fastest_completion,
+        }
+    
+    @staticmethod
+    def check_badge_eligibility(
+        db: Session,
+        user_id: str,
+        badge_requirements: Dict[str, Any],
+        user: Optional[User] = None,
+        progress: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Check if user meets badge requirements
+        
+        Pass ``user`` and ``progress`` (from get_badge_progress) to reuse them
+        across the badges checked for one user.
+        """
+        if user is None:
+            user = UserCRUD.get_user_by_id(db, user_id)
         
         if not user:
             return False
         
+        if progress is None and any(
+            requirement not in ("bugs_found", "challenges_completed") for requirement in badge_requirements
+        ):
+            progress = BadgeCRUD.get_badge_progress(db, user_id)
+        
         # Check each requirement
         for requirement, threshold in badge_requirements.items():
             if requirement == "bugs_found":
                 if user.total_bugs_found < threshold:
                     return False
-            elif requirement == "perfect_scores":
-                perfect_scores = db.query(Submission).filter(
-                    and_(Submission.user_id == user_id, Submission.score == Submission.max_score)
-                ).count()
-                if perfect_scores < threshold:
-                    return False
             elif requirement == "challenges_completed":
                 if user.total_sessions < threshold:
                     return False
+            elif requirement == "fastest_completion":
+                fastest = progress["fastest_completion"]
+                if not fastest or fastest > threshold:
+                    return False
+            elif requirement == "perfect_scores":
+                if progress["perfect_scores"] < threshold:
+                    return False
             elif requirement == "security_problems_completed":
-                security_completions = db.query(GameSession).join(Problem).filter(
-                    and_(
-                        GameSession.user_id == user_id,
-                        GameSession.status == "completed",
-                        Problem.category == "security"
-                    )
-                ).count()
-                if security_completions < threshold:
+                if progress["completed_by_category"].get("security", 0) < threshold:
                     return False
             elif requirement == "advanced_completed":
-                advanced_completions = db.query(GameSession).filter(
-                    and_(
-                        GameSession.user_id == user_id,
-                        GameSession.status == "completed",
-                        GameSession.difficulty == "advanced"
-                    )
-                ).count()
-                if advanced_completions < threshold:
-                    return False
-            elif requirement == "fastest_completion":
-                fastest = db.query(func.min(GameSession.time_spent)).filter(
-                    and_(GameSession.user_id == user_id, GameSession.status == "completed")
-                ).scalar()
-                if not fastest or fastest > threshold:
+                if progress["completed_by_difficulty"].get("advanced", 0) < threshold:
                     return False
         
         return True
 
 
+# Leaderboard reads return plain dicts, so skip ORM row processing entirely.
+# Both boards are materialized into the leaderboard table by
+# refresh_leaderboards(); requests only read the precomputed ranks.
+_GLOBAL_STANDINGS_SQL = text(
+    "SELECT id, total_score, total_sessions, "
+    "CAST(total_score AS FLOAT) / total_sessions "
+    "FROM users WHERE total_sessions > 0 "
+    "ORDER BY total_score DESC LIMIT :limit"
+)
+_WEEKLY_STANDINGS_SQL = text(
+    "SELECT users.id, SUM(submissions.score) AS weekly_score, COUNT(submissions.id), "
+    "AVG(CAST(submissions.score AS FLOAT)) "
+    "FROM users JOIN submissions ON submissions.user_id = users.id "
+    "WHERE submissions.submitted_at >= :since "
+    "GROUP BY users.id "
+    "ORDER BY weekly_score DESC LIMIT :limit"
+).bindparams(bindparam("since", type_=DateTime(timezone=True)))
+# Transaction-scoped advisory lock: concurrent refreshes run one after another,
+# so one run's DELETE never misses another's uncommitted INSERT
+_LEADERBOARD_REFRESH_LOCK_SQL = text("SELECT pg_advisory_xact_lock(:key)")
+LEADERBOARD_REFRESH_LOCK_KEY = 0x6C62_7266  # "lbrf"
+_CLEAR_BOARD_SQL = text("DELETE FROM leaderboard WHERE board_type = :board_type")
+_BOARD_SQL = text(
+    "SELECT users.username, users.display_name, leaderboard.total_score, "
+    "leaderboard.sessions_count, users.accuracy_rate "
+    "FROM leaderboard JOIN users ON users.id = leaderboard.user_id "
+    "WHERE leaderboard.board_type = :board_type "
+    "ORDER BY leaderboard.rank LIMIT :limit"
+)
+
+# Entries kept per materialized board
+LEADERBOARD_SIZE = 1000
+
+
 # Leaderboard CRUD operations
 class LeaderboardCRUD:
+    @staticmethod
+    def refresh_leaderboards(db: Session, size: int = LEADERBOARD_SIZE):
+        """Recompute the global and weekly boards into the leaderboard table, in one transaction"""
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(_LEADERBOARD_REFRESH_LOCK_SQL, {"key": LEADERBOARD_REFRESH_LOCK_KEY})
+        now = datetime.utcnow()
+        week_ago = now - timedelta(days=7)
+        boards = (
+            ("global", None, db.execute(_GLOBAL_STANDINGS_SQL, {"limit": size}).fetchall()),
+            ("weekly", week_ago, db.execute(_WEEKLY_STANDINGS_SQL, {"since": week_ago, "limit": size}).fetchall()),
+        )
+        for board_type, period_start, standings in boards:
+            db.execute(_CLEAR_BOARD_SQL, {"board_type": board_type})
+            rows = [
+                {
+                    "user_id": user_id,
+                    "board_type": board_type,
+                    "period_start": period_start,
+                    "period_end": now if period_start else None,
+                    "total_score": total_score,
+                    "sessions_count": sessions_count,
+                    "average_score": average_score,
+                    "rank": rank,
+                    "calculated_at": now,
+                }
+                for rank, (user_id, total_score, sessions_count, average_score) in enumerate(standings, 1)
+            ]
+            if rows:
+                db.execute(insert(Leaderboard), rows)
+        db.commit()
+    
     @staticmethod
     def get_global_leaderboard(db: Session, limit: int = 10) -> List[Dict[str, Any]]:
         """Get global leaderboard"""
-        results = db.query(
-            User.username,
-            User.display_name,
-            User.total_score,
-            User.total_sessions,
-            User.accuracy_rate
-        ).filter(
-            User.total_sessions > 0
-        ).order_by(desc(User.total_score)).limit(limit).all()
+        rows = db.execute(_BOARD_SQL, {"board_type": "global", "limit": limit}).fetchall()
         
-        leaderboard = []
-        for rank, result in enumerate(results, 1):
-            leaderboard.append({
+        return [
+            {
                 "rank": rank,
-                "username": result.display_name or result.username,
-                "score": result.total_score,
-                "sessions": result.total_sessions,
-                "accuracy": result.accuracy_rate
-            })
-        
-        return leaderboard
+                "username": display_name or username,
+                "score": total_score,
+                "sessions": sessions,
+                "accuracy": accuracy_rate
+            }
+            for rank, (username, display_name, total_score, sessions, accuracy_rate) in enumerate(rows, 1)
+        ]
     
     @staticmethod
     def get_weekly_leaderboard(db: Session, limit: int = 10) -> List[Dict[str, Any]]:
         """Get weekly leaderboard"""
-        week_ago = datetime.utcnow() - timedelta(days=7)
+        rows = db.execute(_BOARD_SQL, {"board_type": "weekly", "limit": limit}).fetchall()
         
-        results = db.query(
-            User.username,
-            User.display_name,
-            func.sum(Submission.score).label('weekly_score'),
-            func.count(Submission.id).label('weekly_submissions')
-        ).join(Submission).filter(
-            Submission.submitted_at >= week_ago
-        ).group_by(User.id, User.username, User.display_name).order_by(
-            desc('weekly_score')
-        ).limit(limit).all()
-        
-        leaderboard = []
-        for rank, result in enumerate(results, 1):
-            leaderboard.append({
+        return [
+            {
                 "rank": rank,
-                "username": result.display_name or result.username,
-                "score": result.weekly_score,
-                "submissions": result.weekly_submissions
-            })
-        
-        return leaderboard
+                "username": display_name or username,
+                "score": weekly_score,
+                "submissions": weekly_submissions
+            }
+            for rank, (username, display_name, weekly_score, weekly_submissions, _) in enumerate(rows, 1)
+        ]
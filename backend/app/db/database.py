@@ -2,21 +2,44 @@
 Database configuration and models
 """
 
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
+
+def _orjson_dumps(value) -> str:
+    """JSON column serializer; the drivers expect text, not orjson's bytes"""
+    # Non-string keys are stringified like stdlib json does
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 # Create database engine (synchronous for now)
+# Pre-ping replaces connections the server or a proxy dropped while idle, and
+# recycling keeps them from outliving server-side timeouts. In production the
+# URL can point at a PgBouncer sidecar (port 6432) to share server connections
+# across API workers. LIFO checkout reuses the most recently returned
+# connection, so idle extras age out via recycle instead of all staying warm.
 engine = create_engine(
     settings.DATABASE_URL,
     pool_size=settings.DATABASE_POOL_SIZE,
     max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+    query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+    # JSON columns (bug lists, feedback) go through orjson instead of stdlib json
+    json_serializer=_orjson_dumps,
+    json_deserializer=orjson.loads,
     echo=settings.DEBUG,  # Log SQL queries in debug mode
 )
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay loaded after commit; each request gets its own short-lived
+# session, so there is nothing stale to guard against by re-SELECTing them.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create base class for models
 Base = declarative_base()
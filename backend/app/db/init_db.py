@@ -5,14 +5,83 @@ Database initialization and seeding
 import json
 import os
 from pathlib import Path
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+from app.db.crud import insert_on_conflict
 from app.db.database import engine, SessionLocal
 from app.db.models import Base, Problem, Badge, User
+from app.services.badge_service import BadgeService
 from app.services.problem_service import problem_service
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Demo account credentials. The hash is a constant so init doesn't pay for a
+# bcrypt round; regenerate it with scripts/gen_demo_hash.py after changing
+# the password.
+DEMO_PASSWORD = "demo123456"
+DEMO_PASSWORD_HASH = "$2b$12$cbR7.GzESxO1d2/Acjp.b.EW6FA3e7nAcA/wGyUZp4hKJBoR9erH6"
+
+# Seeded badge definitions, inserted in one statement by seed_badges()
+_BADGE_ROWS = (
+    {
+        "id": "first_bug",
+        "name": "First Bug Hunter",
+        "description": "Found your first bug!",
+        "icon": "🐛",
+        "category": "milestone",
+        "requirements": {"bugs_found": 1}
+    },
+    {
+        "id": "perfect_score",
+        "name": "Perfect Score",
+        "description": "Achieved 100% accuracy in a challenge",
+        "icon": "🎯",
+        "category": "achievement",
+        "requirements": {"perfect_scores": 1}
+    },
+    {
+        "id": "bug_master",
+        "name": "Bug Master",
+        "description": "Found 50 bugs across all challenges",
+        "icon": "🏆",
+        "category": "milestone",
+        "requirements": {"bugs_found": 50}
+    },
+    {
+        "id": "security_expert",
+        "name": "Security Expert",
+        "description": "Completed 5 security-related challenges",
+        "icon": "🔒",
+        "category": "expertise",
+        "requirements": {"security_problems_completed": 5}
+    },
+    {
+        "id": "speed_demon",
+        "name": "Speed Demon",
+        "description": "Completed a challenge in under 2 minutes",
+        "icon": "⚡",
+        "category": "achievement",
+        "requirements": {"fastest_completion": 120}
+    },
+    {
+        "id": "persistent_learner",
+        "name": "Persistent Learner",
+        "description": "Completed 10 challenges",
+        "icon": "📚",
+        "category": "milestone",
+        "requirements": {"challenges_completed": 10}
+    },
+    {
+        "id": "advanced_challenger",
+        "name": "Advanced Challenger",
+        "description": "Completed 3 advanced difficulty challenges",
+        "icon": "🔥",
+        "category": "difficulty",
+        "requirements": {"advanced_completed": 3}
+    }
+)
+
 
 def create_tables():
     """Create all database tables"""
@@ -28,30 +97,36 @@ def seed_problems(db: Session):
     # Get all problems from problem service
     problems_data = problem_service.get_all_problems()
     
-    for problem_data in problems_data:
-        # Check if problem already exists
-        existing_problem = db.query(Problem).filter(Problem.id == problem_data['id']).first()
-        if existing_problem:
-            logger.info(f"Problem {problem_data['id']} already exists, skipping...")
-            continue
-        
-        # Create new problem
-        problem = Problem(
-            id=problem_data['id'],
-            title=problem_data['title'],
-            description=problem_data['description'],
-            difficulty=problem_data['difficulty'],
-            category=problem_data['category'],
-            code=problem_data['code'],
-            bugs=problem_data['bugs'],
-            test_cases=problem_data.get('test_cases', []),
-            learning_objectives=problem_data.get('learning_objectives', [])
-        )
-        
-        db.add(problem)
-        logger.info(f"Added problem: {problem_data['title']}")
+    # One SELECT for the ids already present, one bulk INSERT for the rest
+    incoming_ids = [problem_data['id'] for problem_data in problems_data]
+    existing_ids = {
+        row.id for row in db.query(Problem.id).filter(Problem.id.in_(incoming_ids))
+    }
+    for problem_id in sorted(existing_ids):
+        logger.info(f"Problem {problem_id} already exists, skipping...")
+    
+    rows = [
+        {
+            "id": problem_data['id'],
+            "title": problem_data['title'],
+            "description": problem_data['description'],
+            "difficulty": problem_data['difficulty'],
+            "category": problem_data['category'],
+            "code": problem_data['code'],
+            "bugs": problem_data['bugs'],
+            "test_cases": problem_data.get('test_cases', []),
+            "learning_objectives": problem_data.get('learning_objectives', [])
+        }
+        for problem_data in problems_data
+        if problem_data['id'] not in existing_ids
+    ]
+    if rows:
+        db.execute(insert(Problem), rows)
+        for row in rows:
+            logger.info(f"Added problem: {row['title']}")
     
     db.commit()
+    problem_service.invalidate_db_problems()
     logger.info("Problems seeded successfully")
 
 
@@ -59,85 +134,30 @@ def seed_badges(db: Session):
     """Seed initial badges"""
     logger.info("Seeding badges...")
     
-    badges_data = [
-        {
-            "id": "first_bug",
-            "name": "First Bug Hunter",
-            "description": "Found your first bug!",
-            "icon": "🐛",
-            "category": "milestone",
-            "requirements": {"bugs_found": 1}
-        },
-        {
-            "id": "perfect_score",
-            "name": "Perfect Score",
-            "description": "Achieved 100% accuracy in a challenge",
-            "icon": "🎯",
-            "category": "achievement",
-            "requirements": {"perfect_scores": 1}
-        },
-        {
-            "id": "bug_master",
-            "name": "Bug Master",
-            "description": "Found 50 bugs across all challenges",
-            "icon": "🏆",
-            "category": "milestone",
-            "requirements": {"bugs_found": 50}
-        },
-        {
-            "id": "security_expert",
-            "name": "Security Expert",
-            "description": "Completed 5 security-related challenges",
-            "icon": "🔒",
-            "category": "expertise",
-            "requirements": {"security_problems_completed": 5}
-        },
-        {
-            "id": "speed_demon",
-            "name": "Speed Demon",
-            "description": "Completed a challenge in under 2 minutes",
-            "icon": "⚡",
-            "category": "achievement",
-            "requirements": {"fastest_completion": 120}
-        },
-        {
-            "id": "persistent_learner",
-            "name": "Persistent Learner",
-            "description": "Completed 10 challenges",
-            "icon": "📚",
-            "category": "milestone",
-            "requirements": {"challenges_completed": 10}
-        },
-        {
-            "id": "advanced_challenger",
-            "name": "Advanced Challenger",
-            "description": "Completed 3 advanced difficulty challenges",
-            "icon": "🔥",
-            "category": "difficulty",
-            "requirements": {"advanced_completed": 3}
+    stmt = insert_on_conflict(db, Badge)
+    if stmt is not None:
+        # One multi-row INSERT; badges that already exist are left untouched
+        added = db.execute(
+            stmt.values(list(_BADGE_ROWS))
+            .on_conflict_do_nothing(index_elements=["id"])
+            .returning(Badge.name)
+        ).scalars().all()
+    else:
+        # One SELECT for the ids already present, one bulk INSERT for the rest
+        incoming_ids = [badge_data['id'] for badge_data in _BADGE_ROWS]
+        existing_ids = {
+            row.id for row in db.query(Badge.id).filter(Badge.id.in_(incoming_ids))
         }
-    ]
+        rows = [badge_data for badge_data in _BADGE_ROWS if badge_data['id'] not in existing_ids]
+        if rows:
+            db.execute(insert(Badge), rows)
+        added = [row['name'] for row in rows]
     
-    for badge_data in badges_data:
-        # Check if badge already exists
-        existing_badge = db.query(Badge).filter(Badge.id == badge_data['id']).first()
-        if existing_badge:
-            logger.info(f"Badge {badge_data['id']} already exists, skipping...")
-            continue
-        
-        badge = Badge(
-            id=badge_data['id'],
-            name=badge_data['name'],
-            description=badge_data['description'],
-            icon=badge_data['icon'],
-            category=badge_data['category'],
-            requirements=badge_data['requirements']
-        )
-        
-        db.add(badge)
-        logger.info(f"Added badge: {badge_data['name']}")
+    for name in added:
+        logger.info(f"Added badge: {name}")
     
     db.commit()
+    BadgeService.invalidate()
     logger.info("Badges seeded successfully")
 
 
@@ -151,16 +171,11 @@ def create_demo_user(db: Session):
         logger.info("Demo user already exists, skipping...")
         return
     
-    # Import auth service for password hashing
-    from app.services.auth_service import AuthService
-    
-    # Create demo user with hashed password
-    demo_password_hash = AuthService.get_password_hash("demo123456")
-    
+    # Create demo user with the precomputed hash; no bcrypt work at init
     demo_user = User(
         username="demo_user",
         email="demo@codereviewquest.com",
-        password_hash=demo_password_hash,
+        password_hash=DEMO_PASSWORD_HASH,
         display_name="Demo User",
         total_sessions=15,
         total_score=1250,
@@ -172,7 +187,7 @@ def create_demo_user(db: Session):
     
     db.add(demo_user)
     db.commit()
-    logger.info("Demo user created successfully (username: demo_user, password: demo123456)")
+    logger.info(f"Demo user created successfully (username: demo_user, password: {DEMO_PASSWORD})")
 
 
 def init_database():
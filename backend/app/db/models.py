@@ -3,20 +3,79 @@ Database models for Code Review Quest
 """
 
 from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
+import os
+import time
 import uuid
 
 Base = declarative_base()
 
+# Binary JSONB on PostgreSQL (parsed once on write, GIN-indexable); plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+class json_array_length(GenericFunction):
+    """``func.json_array_length``, compiled to jsonb_array_length on PostgreSQL"""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(json_array_length, "postgresql")
+def _compile_jsonb_array_length(element, compiler, **kw):
+    return "jsonb_array_length(%s)" % compiler.process(element.clauses, **kw)
+
+
+class keyset_timestamp(GenericFunction):
+    """Timestamp as compared for keyset paging, compiled to julianday() on SQLite
+    
+    SQLite stores server-default timestamps as 'YYYY-MM-DD HH:MM:SS' text but
+    binds datetimes with microseconds, so the raw strings don't order tied
+    rows correctly; julianday() compares both as the same instant.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(keyset_timestamp)
+def _compile_keyset_timestamp(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(keyset_timestamp, "sqlite")
+def _compile_keyset_timestamp_sqlite(element, compiler, **kw):
+    return "julianday(%s)" % compiler.process(element.clauses, **kw)
+
+
+def uuid7_str() -> str:
+    """Time-ordered UUIDv7 string, so new primary keys land at the end of the index"""
+    # 48-bit Unix milliseconds, version 7, 12 + 62 random bits, RFC 9562 variant
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (time.time_ns() // 1_000_000 & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (rand >> 68) << 64
+        | 0b10 << 62
+        | rand & 0x3FFF_FFFF_FFFF_FFFF
+    )
+    return str(uuid.UUID(int=value))
+
+
+# Relationships are declared lazy="raise_on_sql": reading one that is not
+# already loaded raises instead of silently issuing a query per object, so
+# callers must opt in with selectinload()/joinedload().
+
 
 class User(Base):
     """User model for authentication and profile management"""
     __tablename__ = "users"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=uuid7_str)
     username = Column(String(50), unique=True, nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)  # Added password hash
@@ -44,16 +103,16 @@ class User(Base):
     last_login = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
-    sessions = relationship("GameSession", back_populates="user")
-    submissions = relationship("Submission", back_populates="user")
-    badges = relationship("UserBadge", back_populates="user")
+    sessions = relationship("GameSession", back_populates="user", lazy="raise_on_sql")
+    submissions = relationship("Submission", back_populates="user", lazy="raise_on_sql")
+    badges = relationship("UserBadge", back_populates="user", lazy="raise_on_sql")
 
 
 class Problem(Base):
     """Problem model for storing coding challenges"""
     __tablename__ = "problems"
     
-    id = Column(String, primary_key=True)  # e.g., "001_division_by_zero"
+    id = Column(String(64), primary_key=True)  # e.g., "001_division_by_zero"
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=False)
     difficulty = Column(String(20), nullable=False)  # beginner, intermediate, advanced
@@ -61,12 +120,12 @@ class Problem(Base):
     
     # Code and solution data
     code = Column(Text, nullable=False)
-    bugs = Column(JSON, nullable=False)  # List of bug objects
-    test_cases = Column(JSON, nullable=True)
-    learning_objectives = Column(JSON, nullable=True)
+    bugs = Column(JSONDocument, nullable=False)  # List of bug objects
+    test_cases = Column(JSONDocument, nullable=True)
+    learning_objectives = Column(JSONDocument, nullable=True)
     
     # Metadata
-    created_by = Column(String, ForeignKey("users.id"), nullable=True)
+    created_by = Column(String(36), ForeignKey("users.id"), nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -77,26 +136,26 @@ class Problem(Base):
     average_score = Column(Float, default=0.0)
     
     # Relationships
-    sessions = relationship("GameSession", back_populates="problem")
+    sessions = relationship("GameSession", back_populates="problem", lazy="raise_on_sql")
 
 
 class GameSession(Base):
     """Game session model for tracking individual play sessions"""
     __tablename__ = "game_sessions"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=uuid7_str)
     session_id = Column(String(100), unique=True, nullable=False)  # e.g., "session_1234567890"
     
     # Foreign keys
-    user_id = Column(String, ForeignKey("users.id"), nullable=True)  # Nullable for guest users
-    problem_id = Column(String, ForeignKey("problems.id"), nullable=False)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=True)  # Nullable for guest users
+    problem_id = Column(String(64), ForeignKey("problems.id"), nullable=False)
     
     # Session configuration
     difficulty = Column(String(20), nullable=False)
     time_limit = Column(Integer, nullable=False)  # in seconds
     
     # Session state
-    status = Column(String(20), default="active")  # active, completed, expired
+    status = Column(String(16), default="active")  # active, completed, expired
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     time_spent = Column(Integer, nullable=True)  # in seconds
@@ -109,88 +168,88 @@ class GameSession(Base):
     false_positives = Column(Integer, nullable=True)
     
     # Relationships
-    user = relationship("User", back_populates="sessions")
-    problem = relationship("Problem", back_populates="sessions")
-    submissions = relationship("Submission", back_populates="session")
+    user = relationship("User", back_populates="sessions", lazy="raise_on_sql")
+    problem = relationship("Problem", back_populates="sessions", lazy="raise_on_sql")
+    submissions = relationship("Submission", back_populates="session", lazy="raise_on_sql")
 
 
 class Submission(Base):
     """Submission model for storing bug reports and evaluations"""
     __tablename__ = "submissions"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=uuid7_str)
     
     # Foreign keys
-    session_id = Column(String, ForeignKey("game_sessions.id"), nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    session_id = Column(String(36), ForeignKey("game_sessions.id"), nullable=False)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=True)
     
     # Submission data
-    bugs_reported = Column(JSON, nullable=False)  # List of reported bugs
+    bugs_reported = Column(JSONDocument, nullable=False)  # List of reported bugs
     score = Column(Integer, nullable=False)
     max_score = Column(Integer, nullable=False)
     
     # Evaluation results
-    correct_bugs = Column(JSON, nullable=False)
-    missed_bugs = Column(JSON, nullable=False)
-    false_positives = Column(JSON, nullable=False)
-    detailed_feedback = Column(JSON, nullable=True)
+    correct_bugs = Column(JSONDocument, nullable=False)
+    missed_bugs = Column(JSONDocument, nullable=False)
+    false_positives = Column(JSONDocument, nullable=False)
+    detailed_feedback = Column(JSONDocument, nullable=True)
     
     # Timestamps
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    session = relationship("GameSession", back_populates="submissions")
-    user = relationship("User", back_populates="submissions")
+    session = relationship("GameSession", back_populates="submissions", lazy="raise_on_sql")
+    user = relationship("User", back_populates="submissions", lazy="raise_on_sql")
 
 
 class Badge(Base):
     """Badge definitions"""
     __tablename__ = "badges"
     
-    id = Column(String, primary_key=True)
+    id = Column(String(64), primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=False)
-    icon = Column(String(50), nullable=True)
+    icon = Column(String(32), nullable=True)
     category = Column(String(50), nullable=True)
     
     # Requirements (JSON format for flexibility)
-    requirements = Column(JSON, nullable=False)
+    requirements = Column(JSONDocument, nullable=False)
     
     # Metadata
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    user_badges = relationship("UserBadge", back_populates="badge")
+    user_badges = relationship("UserBadge", back_populates="badge", lazy="raise_on_sql")
 
 
 class UserBadge(Base):
     """User badge achievements"""
     __tablename__ = "user_badges"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=uuid7_str)
     
     # Foreign keys
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    badge_id = Column(String, ForeignKey("badges.id"), nullable=False)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
+    badge_id = Column(String(64), ForeignKey("badges.id"), nullable=False)
     
     # Achievement data
     earned_at = Column(DateTime(timezone=True), server_default=func.now())
-    progress_data = Column(JSON, nullable=True)  # For tracking progress towards badge
+    progress_data = Column(JSONDocument, nullable=True)  # For tracking progress towards badge
     
     # Relationships
-    user = relationship("User", back_populates="badges")
-    badge = relationship("Badge", back_populates="user_badges")
+    user = relationship("User", back_populates="badges", lazy="raise_on_sql")
+    badge = relationship("Badge", back_populates="user_badges", lazy="raise_on_sql")
 
 
 class Leaderboard(Base):
     """Leaderboard entries for different time periods and categories"""
     __tablename__ = "leaderboard"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String(36), primary_key=True, default=uuid7_str)
     
     # Foreign key
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
     
     # Leaderboard type and period
     board_type = Column(String(50), nullable=False)  # overall, weekly, monthly, category
@@ -208,7 +267,7 @@ class Leaderboard(Base):
     calculated_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    user = relationship("User")
+    user = relationship("User", lazy="raise_on_sql")
 
 
 # Index definitions for performance
@@ -217,11 +276,31 @@ from sqlalchemy import Index
 # Indexes for common queries
 Index('idx_user_username', User.username)
 Index('idx_user_email', User.email)
-Index('idx_session_user_id', GameSession.user_id)
 Index('idx_session_problem_id', GameSession.problem_id)
 Index('idx_session_status', GameSession.status)
 Index('idx_submission_session_id', Submission.session_id)
-Index('idx_submission_user_id', Submission.user_id)
 Index('idx_leaderboard_type_period', Leaderboard.board_type, Leaderboard.period_start)
+Index('idx_leaderboard_type_rank', Leaderboard.board_type, Leaderboard.rank)
 Index('idx_problem_difficulty', Problem.difficulty)
 Index('idx_problem_category', Problem.category)
+
+# One row per earned badge; also serves the per-user badge lookups on submit
+Index('idx_user_badge_user_badge', UserBadge.user_id, UserBadge.badge_id, unique=True)
+
+# Composite indexes matching the per-user queries; their leading user_id
+# column also serves the plain user_id lookups the single-column indexes did
+Index('idx_session_user_started', GameSession.user_id, GameSession.started_at.desc())
+Index('idx_session_user_status_difficulty', GameSession.user_id, GameSession.status, GameSession.difficulty)
+Index('idx_submission_user_submitted', Submission.user_id, Submission.submitted_at.desc())
+Index('idx_submission_user_score_max', Submission.user_id, Submission.score, Submission.max_score)
+
+# Session start only picks from active problems
+Index(
+    'idx_problem_active_difficulty',
+    Problem.difficulty,
+    postgresql_where=Problem.is_active.is_(True),
+    sqlite_where=Problem.is_active.is_(True),
+)
+
+# Containment lookups on problem bugs (e.g. by bug type) on PostgreSQL only
+Index('idx_problem_bugs_gin', Problem.bugs, postgresql_using='gin').ddl_if(dialect='postgresql')
@@ -5,28 +5,62 @@ Main application entry point
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+import anyio
+import asyncio
+import logging
+import os
+import random
 import structlog
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.logging import setup_logging
+from app.core.logging import setup_logging, start_log_listener, stop_log_listener
 from app.api.v1 import api_router
 from app.db.database import engine
+from app.services.guest_service import GuestService
 
 # Setup structured logging
 setup_logging()
-logger = structlog.get_logger()
+logger = structlog.get_logger(__name__)
+
+# Decided once: skipped requests don't build the log event at all
+_LOG_REQUESTS = getattr(logging, settings.LOG_LEVEL.upper()) <= logging.INFO
+_LOG_SAMPLE_RATE = settings.LOG_SAMPLE_RATE
+
+
+async def cleanup_guest_sessions_periodically():
+    """Drop expired guest sessions on a fixed interval until cancelled"""
+    while True:
+        await asyncio.sleep(settings.GUEST_CLEANUP_SECONDS)
+        try:
+            removed = GuestService.cleanup_expired_sessions()
+            if removed:
+                logger.info("Expired guest sessions removed", count=removed)
+        except Exception as exc:
+            logger.warning("Guest session cleanup failed", exception=str(exc))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
+    start_log_listener()
     logger.info("🚀 Starting Code Review Quest API", version=settings.VERSION)
     
+    # Size both pools explicitly: sync ``def`` handlers run on AnyIO's worker
+    # threads, while AuthService's asyncio.to_thread DB calls use the loop's
+    # default executor (password hashing has a pool of its own).
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_MAX_WORKERS
+    executor = ThreadPoolExecutor(max_workers=settings.THREADPOOL_MAX_WORKERS, thread_name_prefix="crq-worker")
+    asyncio.get_running_loop().set_default_executor(executor)
+    
+    guest_cleanup = asyncio.create_task(cleanup_guest_sessions_periodically())
+    
     # Note: Database tables will be created when needed
     logger.info("✅ API ready to serve requests")
     
@@ -34,6 +68,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down Code Review Quest API")
+    guest_cleanup.cancel()
+    executor.shutdown(wait=False)
+    stop_log_listener()
 
 
 # Create FastAPI application
@@ -44,6 +81,7 @@ app = FastAPI(
     docs_url="/docs" if settings.ENVIRONMENT != "production" else None,
     redoc_url="/redoc" if settings.ENVIRONMENT != "production" else None,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Security middleware
@@ -61,23 +99,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (problem code, explanations, leaderboards)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
     response.headers["X-Process-Time"] = str(process_time)
     
-    # Log request
-    logger.info(
-        "HTTP request processed",
-        method=request.method,
-        url=str(request.url),
-        status_code=response.status_code,
-        process_time=process_time,
-    )
+    # Log request (only a LOG_SAMPLE_RATE fraction of them)
+    if _LOG_REQUESTS and (_LOG_SAMPLE_RATE >= 1.0 or random.random() < _LOG_SAMPLE_RATE):
+        logger.info(
+            "HTTP request processed",
+            method=request.method,
+            url=str(request.url),
+            status_code=response.status_code,
+            process_time=process_time,
+        )
     
     return response
 
@@ -91,7 +133,7 @@ async def http_exception_handler(request, exc):
         detail=exc.detail,
         url=str(request.url),
     )
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail, "type": "http_exception"},
     )
@@ -105,7 +147,7 @@ async def general_exception_handler(request, exc):
         url=str(request.url),
         exc_info=True,
     )
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": "Internal server error",
@@ -146,10 +188,16 @@ app.include_router(api_router, prefix="/api/v1")
 if __name__ == "__main__":
     import uvicorn
     
+    # uvloop and httptools ship with uvicorn[standard]. Guest sessions and the
+    # caches are per process, so more workers need sticky routing. uvicorn
+    # ignores workers when reloading, so they are only passed outside DEBUG.
+    run_options = {"reload": True} if settings.DEBUG else {"workers": int(os.getenv("WEB_CONCURRENCY", "1"))}
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.ENVIRONMENT == "development",
+        loop="uvloop",
+        http="httptools",
         log_level="info",
+        **run_options,
     )
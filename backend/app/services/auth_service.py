@@ -2,36 +2,114 @@
 Authentication service for user registration and login
 """
 
+import asyncio
+import bcrypt
 import hashlib
+import jwt
+import os
+import re
 import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 from app.db.models import User
 from app.db.crud import UserCRUD
 from app.core.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = settings.SECRET_KEY or "your-secret-key-here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+# bcrypt is CPU-bound (and releases the GIL), so it gets its own pool sized to
+# the cores instead of competing with DB calls on the default executor
+_hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="crq-bcrypt")
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+
+# Character classes seen by validate_password
+_HAS_UPPER, _HAS_LOWER, _HAS_DIGIT = 1, 2, 4
+
+# Verified token cache: sha256(token) -> (user_id, exp). Repeated requests with
+# the same bearer token skip JWT decoding; failed verifications are never cached.
+TOKEN_CACHE_TTL_SECONDS = 30
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+# User snapshot cache: user_id -> UserView. Dropped via invalidate_user()
+# whenever the user's row changes.
+USER_CACHE_TTL_SECONDS = 60
+_user_cache: TTLCache = TTLCache(maxsize=5_000, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class UserView:
+    """Read-only snapshot of a user row, safe to share across requests"""
+    id: str
+    username: str
+    email: str
+    display_name: Optional[str]
+    total_sessions: int
+    total_score: int
+    best_score: int
+    total_bugs_found: int
+    accuracy_rate: float
+    is_verified: bool
+    # Serialized once when the view is built, not on every /me or profile hit
+    created_at_iso: Optional[str]
+    
+    @classmethod
+    def from_user(cls, user: User) -> "UserView":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            display_name=user.display_name,
+            total_sessions=user.total_sessions or 0,
+            total_score=user.total_score or 0,
+            best_score=user.best_score or 0,
+            total_bugs_found=user.total_bugs_found or 0,
+            accuracy_rate=user.accuracy_rate or 0.0,
+            is_verified=bool(user.is_verified),
+            created_at_iso=user.created_at.isoformat() if user.created_at else None,
+        )
+
 
 class AuthService:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        # checkpw compares the derived hash in constant time
+        try:
+            return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+        except ValueError:
+            # Not a bcrypt hash
+            return False
     
     @staticmethod
     def get_password_hash(password: str) -> str:
         """Hash a password"""
-        return pwd_context.hash(password)
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=settings.BCRYPT_COST)).decode()
+    
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verify a password on the hashing pool so the event loop stays free"""
+        return await asyncio.get_running_loop().run_in_executor(
+            _hash_pool, AuthService.verify_password, plain_password, hashed_password
+        )
+    
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hash a password on the hashing pool so the event loop stays free"""
+        return await asyncio.get_running_loop().run_in_executor(
+            _hash_pool, AuthService.get_password_hash, password
+        )
     
     @staticmethod
     def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -52,21 +130,32 @@ class AuthService:
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             return payload
-        except JWTError:
+        except jwt.InvalidTokenError:
             return None
     
     @staticmethod
-    def register_user(db: Session, email: str, password: str, display_name: str = None) -> Dict[str, Any]:
+    async def register_user(db: Session, email: str, password: str, display_name: str = None) -> Dict[str, Any]:
         """Register a new user"""
         
         # Check if user already exists
-        existing_user = UserCRUD.get_user_by_email(db, email)
+        existing_user = await asyncio.to_thread(UserCRUD.get_user_by_email, db, email)
         if existing_user:
             return {
                 "success": False,
                 "error": "User with this email already exists"
             }
         
+        # Hash password
+        hashed_password = await AuthService.hash_password_async(password)
+        
+        return await asyncio.to_thread(
+            AuthService._create_user, db, email, hashed_password, display_name
+        )
+    
+    @staticmethod
+    def _create_user(db: Session, email: str, hashed_password: str, display_name: str = None) -> Dict[str, Any]:
+        """Create the user row and issue its first access token"""
+        
         # Generate username from email if not provided
         username = email.split('@')[0]
         
@@ -77,9 +166,6 @@ class AuthService:
             username = f"{base_username}{counter}"
             counter += 1
         
-        # Hash password
-        hashed_password = AuthService.get_password_hash(password)
-        
         try:
             # Create user
             user = UserCRUD.create_user(
@@ -115,11 +201,11 @@ class AuthService:
             }
     
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> Dict[str, Any]:
+    async def authenticate_user(db: Session, email: str, password: str) -> Dict[str, Any]:
         """Authenticate a user with email and password"""
         
         # Get user by email
-        user = UserCRUD.get_user_by_email(db, email)
+        user = await asyncio.to_thread(UserCRUD.get_user_by_email, db, email)
         if not user:
             return {
                 "success": False,
@@ -127,14 +213,16 @@ class AuthService:
             }
         
         # Verify password
-        if not AuthService.verify_password(password, user.password_hash):
+        if not await AuthService.verify_password_async(password, user.password_hash):
             return {
                 "success": False,
                 "error": "Invalid email or password"
             }
         
         # Update last login
-        UserCRUD.update_user_stats(db, user.id, {"last_login": datetime.utcnow()})
+        await asyncio.to_thread(
+            UserCRUD.update_user_stats, db, user.id, {"last_login": datetime.utcnow()}
+        )
         
         # Create access token
         access_token = AuthService.create_access_token(
@@ -157,8 +245,43 @@ class AuthService:
         }
     
     @staticmethod
-    def get_current_user(db: Session, token: str) -> Optional[User]:
+    def get_current_user(db: Session, token: str) -> Optional[UserView]:
         """Get current user from JWT token"""
+        user_id = AuthService._resolve_token(token)
+        if not user_id:
+            return None
+        
+        with _user_cache_lock:
+            user_view = _user_cache.get(user_id)
+        if user_view is not None:
+            return user_view
+        
+        user = UserCRUD.get_user_by_id(db, user_id)
+        if not user:
+            return None
+        
+        user_view = UserView.from_user(user)
+        with _user_cache_lock:
+            _user_cache[user_id] = user_view
+        return user_view
+    
+    @staticmethod
+    def invalidate_user(user_id: str):
+        """Drop a cached user snapshot after the user's row changes"""
+        with _user_cache_lock:
+            _user_cache.pop(user_id, None)
+    
+    @staticmethod
+    def _resolve_token(token: str) -> Optional[str]:
+        """Resolve a token to its user ID, using the verified token cache"""
+        key = hashlib.sha256(token.encode()).hexdigest()[:32]
+        with _token_cache_lock:
+            cached = _token_cache.get(key)
+        
+        # Entries never outlive the token itself
+        if cached and cached[1] > time.time():
+            return cached[0]
+        
         payload = AuthService.verify_token(token)
         if not payload:
             return None
@@ -167,14 +290,17 @@ class AuthService:
         if not user_id:
             return None
         
-        return UserCRUD.get_user_by_id(db, user_id)
+        exp = payload.get("exp")
+        if exp:
+            with _token_cache_lock:
+                _token_cache[key] = (user_id, exp)
+        
+        return user_id
     
     @staticmethod
     def validate_email(email: str) -> bool:
         """Basic email validation"""
-        import re
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return EMAIL_PATTERN.match(email) is not None
     
     @staticmethod
     def validate_password(password: str) -> Dict[str, Any]:
@@ -184,13 +310,23 @@ class AuthService:
         if len(password) < 8:
             errors.append("Password must be at least 8 characters long")
         
-        if not any(c.isupper() for c in password):
+        # One pass over the distinct characters collects every class present
+        flags = 0
+        for c in set(password):
+            if c.isupper():
+                flags |= _HAS_UPPER
+            elif c.islower():
+                flags |= _HAS_LOWER
+            elif c.isdigit():
+                flags |= _HAS_DIGIT
+        
+        if not flags & _HAS_UPPER:
             errors.append("Password must contain at least one uppercase letter")
         
-        if not any(c.islower() for c in password):
+        if not flags & _HAS_LOWER:
             errors.append("Password must contain at least one lowercase letter")
         
-        if not any(c.isdigit() for c in password):
+        if not flags & _HAS_DIGIT:
             errors.append("Password must contain at least one number")
         
         return {
@@ -0,0 +1,49 @@
+"""
+Badge definitions service with an in-process cache
+"""
+
+import threading
+from typing import Any, Dict, List
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+from app.db.crud import BadgeCRUD
+
+# Badge definitions only change when they are seeded, but every authenticated
+# submission checks all of them; keep one copy in memory for a few minutes.
+BADGES_CACHE_TTL_SECONDS = 300
+_badges_cache: TTLCache = TTLCache(maxsize=1, ttl=BADGES_CACHE_TTL_SECONDS)
+_badges_lock = threading.Lock()
+_ACTIVE_BADGES = "active"
+
+
+class BadgeService:
+    """Service for reading badge definitions"""
+    
+    @staticmethod
+    def get_active_badges(db: Session) -> List[Dict[str, Any]]:
+        """Get all active badge definitions, served from cache when fresh"""
+        with _badges_lock:
+            cached = _badges_cache.get(_ACTIVE_BADGES)
+        if cached is not None:
+            return cached
+        
+        # Plain dicts, so cached entries never hold on to a request's Session
+        badges = [
+            {
+                "id": badge.id,
+                "name": badge.name,
+                "description": badge.description,
+                "icon": badge.icon,
+                "requirements": badge.requirements
+            }
+            for badge in BadgeCRUD.get_all_badges(db)
+        ]
+        with _badges_lock:
+            _badges_cache[_ACTIVE_BADGES] = badges
+        return badges
+    
+    @staticmethod
+    def invalidate():
+        """Drop cached badge definitions after the badges table changes"""
+        with _badges_lock:
+            _badges_cache.clear()
@@ -2,11 +2,30 @@
 Guest user service for temporary session management
 """
 
+import heapq
+import threading
 import time
 import uuid
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 
+_now = time.time
+
+# (id, session counter, threshold, name, description), checked in order.
+# Counters only grow, so ">= 1 session" is awarded exactly on the first one.
+_GUEST_ACHIEVEMENTS = (
+    ("first_session", "sessions_played", 1, "First Steps",
+     "Completed your first coding challenge as a guest"),
+    ("score_50", "total_score", 50, "Getting Started",
+     "Earned 50+ points as a guest"),
+    ("score_100", "total_score", 100, "Century Guest",
+     "Earned 100+ points as a guest"),
+    ("sessions_3", "sessions_played", 3, "Getting Hooked",
+     "Played 3+ sessions as a guest"),
+    ("sessions_5", "sessions_played", 5, "Regular Guest",
+     "Played 5+ sessions as a guest - time to register?"),
+)
+
 
 class GuestService:
     """Service for managing temporary guest user sessions"""
@@ -14,6 +33,13 @@ class GuestService:
     # In-memory storage for guest sessions (in production, use Redis or similar)
     _guest_sessions: Dict[str, Dict[str, Any]] = {}
     
+    # (expires_at, guest_id) min-heap so cleanup only visits expired sessions
+    _expiry_heap: List[Tuple[float, str]] = []
+    
+    # Guards both structures and the session dicts; guest endpoints run on the
+    # event loop but session/profile handlers read guests from the threadpool
+    _lock = threading.RLock()
+    
     # Session expiration time (24 hours)
     SESSION_DURATION = 24 * 60 * 60  # 24 hours in seconds
     
@@ -21,123 +47,163 @@ class GuestService:
     def create_guest_session(cls, nickname: str = None) -> str:
         """Create a new guest session"""
         guest_id = cls._generate_guest_id()
-        current_time = time.time()
+        current_time = _now()
         
         if not nickname:
             nickname = f"Guest_{guest_id[:8]}"
         
-        cls._guest_sessions[guest_id] = {
-            "guest_id": guest_id,
-            "nickname": nickname,
-            "created_at": current_time,
-            "expires_at": current_time + cls.SESSION_DURATION,
-            "last_active": current_time,
-            "sessions_played": 0,
-            "total_score": 0,
-            "best_score": 0,
-            "bugs_found": 0,
-            "time_played": 0,
-            "favorite_difficulty": "beginner",
-            "achievements": []
-        }
+        with cls._lock:
+            cls._guest_sessions[guest_id] = {
+                "guest_id": guest_id,
+                "nickname": nickname,
+                "created_at": current_time,
+                "expires_at": current_time + cls.SESSION_DURATION,
+                "last_active": current_time,
+                "sessions_played": 0,
+                "total_score": 0,
+                "best_score": 0,
+                "bugs_found": 0,
+                "time_played": 0,
+                "favorite_difficulty": "beginner",
+                "achievements": [],
+                "achievements_ids": set()
+            }
+            heapq.heappush(cls._expiry_heap, (current_time + cls.SESSION_DURATION, guest_id))
         
         return guest_id
     
     @classmethod
     def get_guest_session(cls, guest_id: str) -> Optional[Dict[str, Any]]:
         """Get guest session if it exists and hasn't expired"""
-        if guest_id not in cls._guest_sessions:
-            return None
-        
-        session = cls._guest_sessions[guest_id]
-        
-        # Check if session has expired
-        if time.time() > session["expires_at"]:
-            del cls._guest_sessions[guest_id]
-            return None
-        
-        # Update last active time
-        session["last_active"] = time.time()
-        return session
+        with cls._lock:
+            session = cls._guest_sessions.get(guest_id)
+            if session is None:
+                return None
+            
+            # Check if session has expired
+            current_time = _now()
+            if current_time > session["expires_at"]:
+                del cls._guest_sessions[guest_id]
+                return None
+            
+            # Update last active time
+            session["last_active"] = current_time
+            return session
     
     @classmethod
     def get_guest_profile(cls, guest_id: str) -> Optional[Dict[str, Any]]:
         """Get guest user profile"""
-        session = cls.get_guest_session(guest_id)
-        if not session:
-            return None
-        
-        return {
-            "guest_id": guest_id,
-            "nickname": session["nickname"],
-            "created_at": session["created_at"],
-            "sessions_played": session["sessions_played"],
-            "total_score": session["total_score"],
-            "best_score": session["best_score"],
-            "bugs_found": session["bugs_found"],
-            "time_played": session["time_played"],
-            "favorite_difficulty": session["favorite_difficulty"],
-            "achievements": session["achievements"]
-        }
+        with cls._lock:
+            session = cls.get_guest_session(guest_id)
+            if not session:
+                return None
+            
+            return {
+                "guest_id": guest_id,
+                "nickname": session["nickname"],
+                "created_at": session["created_at"],
+                "sessions_played": session["sessions_played"],
+                "total_score": session["total_score"],
+                "best_score": session["best_score"],
+                "bugs_found": session["bugs_found"],
+                "time_played": session["time_played"],
+                "favorite_difficulty": session["favorite_difficulty"],
+                "achievements": list(session["achievements"])
+            }
     
     @classmethod
     def update_guest_nickname(cls, guest_id: str, nickname: str) -> bool:
         """Update guest nickname"""
-        session = cls.get_guest_session(guest_id)
-        if not session:
-            return False
-        
-        session["nickname"] = nickname
-        return True
+        with cls._lock:
+            session = cls.get_guest_session(guest_id)
+            if not session:
+                return False
+            
+            session["nickname"] = nickname
+            return True
     
     @classmethod
     def update_guest_score(cls, guest_id: str, score: int) -> bool:
         """Update guest score and session count"""
-        session = cls.get_guest_session(guest_id)
-        if not session:
-            return False
-        
+        with cls._lock:
+            session = cls.get_guest_session(guest_id)
+            if not session:
+                return False
+            
+            cls._apply_score(guest_id, session, score)
+            return True
+    
+    @classmethod
+    def update_guest_stats(cls, guest_id: str, **kwargs) -> bool:
+        """Update various guest statistics"""
+        with cls._lock:
+            session = cls.get_guest_session(guest_id)
+            if not session:
+                return False
+            
+            cls._apply_stats(session, kwargs)
+            return True
+    
+    @classmethod
+    def apply_guest_update(
+        cls,
+        guest_id: str,
+        nickname: Optional[str] = None,
+        score: Optional[int] = None,
+        **stats: Any
+    ) -> bool:
+        """Apply a nickname, score and stats update with a single session lookup"""
+        with cls._lock:
+            session = cls.get_guest_session(guest_id)
+            if not session:
+                return False
+            
+            if nickname:
+                session["nickname"] = nickname
+            if score is not None:
+                cls._apply_score(guest_id, session, score)
+            if stats:
+                cls._apply_stats(session, stats)
+            return True
+    
+    @classmethod
+    def _apply_score(cls, guest_id: str, session: Dict[str, Any], score: int):
+        """Record a finished game's score on a live guest session"""
         session["sessions_played"] += 1
         session["total_score"] += score
         session["best_score"] = max(session["best_score"], score)
         
         # Update achievements based on score
         cls._update_guest_achievements(guest_id, session)
-        
-        return True
     
-    @classmethod
-    def update_guest_stats(cls, guest_id: str, **kwargs) -> bool:
-        """Update various guest statistics"""
-        session = cls.get_guest_session(guest_id)
-        if not session:
-            return False
+    @staticmethod
+    def _apply_stats(session: Dict[str, Any], stats: Dict[str, Any]):
+        """Accumulate bug/time counters and the favorite difficulty"""
+        if "bugs_found" in stats:
+            session["bugs_found"] += stats["bugs_found"]
         
-        if "bugs_found" in kwargs:
-            session["bugs_found"] += kwargs["bugs_found"]
+        if "time_played" in stats:
+            session["time_played"] += stats["time_played"]
         
-        if "time_played" in kwargs:
-            session["time_played"] += kwargs["time_played"]
-        
-        if "difficulty" in kwargs:
+        if "difficulty" in stats:
             # Simple logic to track favorite difficulty
-            session["favorite_difficulty"] = kwargs["difficulty"]
-        
-        return True
+            session["favorite_difficulty"] = stats["difficulty"]
     
     @classmethod
     def cleanup_expired_sessions(cls):
         """Remove expired guest sessions"""
-        current_time = time.time()
-        expired_sessions = [
-            guest_id for guest_id, session in cls._guest_sessions.items()
-            if current_time > session["expires_at"]
-        ]
-        
-        for guest_id in expired_sessions:
-            del cls._guest_sessions[guest_id]
-        
-        return len(expired_sessions)
+        current_time = _now()
+        heap = cls._expiry_heap
+        removed = 0
+        
+        with cls._lock:
+            while heap and heap[0][0] < current_time:
+                _, guest_id = heapq.heappop(heap)
+                # Sessions read after expiring are already gone
+                if cls._guest_sessions.pop(guest_id, None) is not None:
+                    removed += 1
+        
+        return removed
     
     @classmethod
     def _generate_guest_id(cls) -> str:
@@ -147,47 +213,14 @@ class GuestService:
     @classmethod
     def _update_guest_achievements(cls, guest_id: str, session: Dict[str, Any]):
         """Update guest achievements based on current stats"""
-        achievements = session["achievements"]
-        
-        # First session achievement
-        if session["sessions_played"] == 1 and "first_session" not in [a["id"] for a in achievements]:
-            achievements.append({
-                "id": "first_session",
-                "name": "First Steps",
-                "description": "Completed your first coding challenge as a guest",
-                "earned_at": time.time()
-            })
-        
-        # Score milestones
-        if session["total_score"] >= 50 and "score_50" not in [a["id"] for a in achievements]:
-            achievements.append({
-                "id": "score_50",
-                "name": "Getting Started",
-                "description": "Earned 50+ points as a guest",
-                "earned_at": time.time()
-            })
-        
-        if session["total_score"] >= 100 and "score_100" not in [a["id"] for a in achievements]:
-            achievements.append({
-                "id": "score_100",
-                "name": "Century Guest",
-                "description": "Earned 100+ points as a guest",
-                "earned_at": time.time()
-            })
-        
-        # Session count milestones
-        if session["sessions_played"] >= 3 and "sessions_3" not in [a["id"] for a in achievements]:
-            achievements.append({
-                "id": "sessions_3",
-                "name": "Getting Hooked",
-                "description": "Played 3+ sessions as a guest",
-                "earned_at": time.time()
-            })
-        
-        if session["sessions_played"] >= 5 and "sessions_5" not in [a["id"] for a in achievements]:
-            achievements.append({
-                "id": "sessions_5",
-                "name": "Regular Guest",
-                "description": "Played 5+ sessions as a guest - time to register?",
-                "earned_at": time.time()
-            })
+        earned_ids = session["achievements_ids"]
+        
+        for achievement_id, field, threshold, name, description in _GUEST_ACHIEVEMENTS:
+            if session[field] >= threshold and achievement_id not in earned_ids:
+                earned_ids.add(achievement_id)
+                session["achievements"].append({
+                    "id": achievement_id,
+                    "name": name,
+                    "description": description,
+                    "earned_at": _now()
+                })
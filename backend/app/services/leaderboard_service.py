@@ -0,0 +1,79 @@
+"""
+Leaderboard service with a short-lived in-process cache
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import orjson
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+from app.db.crud import GameSessionCRUD, LeaderboardCRUD
+from app.db.database import SessionLocal
+
+# Leaderboards are read-mostly; a minute of staleness is fine, and a completed
+# session drops only the cached boards its score would actually change.
+LEADERBOARD_CACHE_TTL_SECONDS = 60
+_leaderboard_cache: TTLCache = TTLCache(maxsize=256, ttl=LEADERBOARD_CACHE_TTL_SECONDS)
+_leaderboard_lock = threading.Lock()
+
+
+class LeaderboardService:
+    """Service for building and caching session leaderboards"""
+    
+    @staticmethod
+    def get_leaderboard(
+        db: Session, limit: int = 10, difficulty: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Get the top completed sessions and their ETag, served from cache when fresh"""
+        key = (difficulty or "all", limit)
+        with _leaderboard_lock:
+            cached = _leaderboard_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Rank is computed by the database, one row per leaderboard entry
+        leaderboard = [
+            {
+                "rank": row.rank,
+                "username": row.username,
+                "score": row.final_score,
+                "difficulty": row.difficulty,
+                "completion_time": row.time_spent,
+                "date": row.completed_at.isoformat() if row.completed_at else None
+            }
+            for row in GameSessionCRUD.get_leaderboard(db, limit=limit, difficulty=difficulty)
+        ]
+        
+        etag = 'W/"' + hashlib.blake2s(orjson.dumps(leaderboard)).hexdigest()[:16] + '"'
+        with _leaderboard_lock:
+            _leaderboard_cache[key] = (leaderboard, etag)
+        return leaderboard, etag
+    
+    @staticmethod
+    def record_score(difficulty: str, score: int):
+        """Drop cached boards that a newly completed session's score would enter"""
+        with _leaderboard_lock:
+            for key, (leaderboard, _) in list(_leaderboard_cache.items()):
+                board_difficulty, limit = key
+                if board_difficulty not in ("all", difficulty):
+                    continue
+                # Ties rank the earlier completion first, so only a strictly
+                # higher score displaces the last entry of a full board
+                if not leaderboard or len(leaderboard) < limit or score > leaderboard[-1]["score"]:
+                    del _leaderboard_cache[key]
+    
+    @staticmethod
+    def invalidate():
+        """Drop all cached leaderboards"""
+        with _leaderboard_lock:
+            _leaderboard_cache.clear()
+    
+    @staticmethod
+    def refresh_materialized():
+        """Rebuild the stored global and weekly boards in a session of their own"""
+        db = SessionLocal()
+        try:
+            LeaderboardCRUD.refresh_leaderboards(db)
+        finally:
+            db.close()
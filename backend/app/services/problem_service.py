@@ -2,16 +2,70 @@
 Problem management service
 """
 
+import hashlib
 import json
+import logging
+import orjson
 import os
 import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from pathlib import Path
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+from app.db.crud import ProblemCRUD
+
+logger = logging.getLogger(__name__)
+
+# Difficulty -> session-start summaries of the active DB problems. Problems
+# change rarely, so start_session can pick from memory between refreshes.
+DB_PROBLEMS_CACHE_TTL_SECONDS = 300
+_db_problems_cache: TTLCache = TTLCache(maxsize=8, ttl=DB_PROBLEMS_CACHE_TTL_SECONDS)
+_db_problems_lock = threading.Lock()
+
+# Problem id -> scoring view of an active DB problem, or None when the problem
+# only exists in the JSON catalog (cached too, so misses skip the DB as well)
+_db_problem_cache: TTLCache = TTLCache(maxsize=256, ttl=DB_PROBLEMS_CACHE_TTL_SECONDS)
+_MISSING = object()  # None is a cached value above, so misses need their own marker
+
+
+def index_problem_bugs(problem: Dict) -> Dict:
+    """Attach the bug lookups scoring needs, so they are built once per problem"""
+    bugs_by_line = {}
+    bugs_by_type = defaultdict(list)
+    for bug in problem['bugs']:
+        # First entry wins when a line lists more than one bug
+        bugs_by_line.setdefault(bug['line_number'], bug)
+        bugs_by_type[bug['type'].replace('_', ' ').title()].append(bug)
+    
+    problem['_correct_lines'] = frozenset(bugs_by_line)
+    problem['_bugs_by_line'] = bugs_by_line
+    # Per-type section of the submission explanation; it only depends on the problem
+    problem['_bugs_section'] = "\n".join(
+        line
+        for bug_type, bugs in bugs_by_type.items()
+        for line in (
+            f"**{bug_type} Issues:**",
+            *(f"  - Line {bug['line_number']}: {bug['description']}" for bug in bugs),
+        )
+    )
+    return problem
+
+
+def _read_problem_file(problem_file: Path) -> Dict:
+    """Read and parse one problem JSON file"""
+    with open(problem_file, 'rb') as f:
+        return orjson.loads(f.read())
 
 class ProblemService:
     def __init__(self):
         self.problems_dir = Path("/app/problems")
         self._problems_cache = {}
+        self._by_difficulty: Dict[str, List[Dict]] = defaultdict(list)
+        self._by_category: Dict[str, List[Dict]] = defaultdict(list)
+        self.catalog_etag = 'W/"empty"'
         self._load_problems()
     
     def _load_problems(self):
@@ -21,17 +75,34 @@ class ProblemService:
             self.problems_dir = Path("problems")
         
         if not self.problems_dir.exists():
-            print("Warning: Problems directory not found")
+            logger.warning("Problems directory not found")
             return
         
-        for problem_file in self.problems_dir.glob("*.json"):
+        # Files are read concurrently but merged here, in directory order
+        problem_files = list(self.problems_dir.glob("*.json"))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            loads = [pool.submit(_read_problem_file, problem_file) for problem_file in problem_files]
+        
+        for problem_file, load in zip(problem_files, loads):
             try:
-                with open(problem_file, 'r', encoding='utf-8') as f:
-                    problem_data = json.load(f)
-                    self._problems_cache[problem_data['id']] = problem_data
-                    print(f"Loaded problem: {problem_data['id']}")
+                problem_data = load.result()
+                self._problems_cache[problem_data['id']] = problem_data
+                self._by_difficulty[problem_data.get('difficulty', 'unknown')].append(problem_data)
+                self._by_category[problem_data.get('category', 'unknown')].append(problem_data)
+                logger.debug("Loaded problem: %s", problem_data['id'])
             except Exception as e:
-                print(f"Error loading problem {problem_file}: {e}")
+                logger.error("Error loading problem %s: %s", problem_file, e)
+        
+        self.catalog_etag = self._compute_catalog_etag()
+        
+        # After the ETag, which hashes only what was read from the files
+        for problem_data in self._problems_cache.values():
+            index_problem_bugs(problem_data)
+    
+    def _compute_catalog_etag(self) -> str:
+        """Weak ETag over the loaded catalog; changes only when problem files do"""
+        payload = json.dumps(self._problems_cache, sort_keys=True).encode()
+        return 'W/"' + hashlib.blake2s(payload).hexdigest()[:16] + '"'
     
     def get_problem_by_id(self, problem_id: str) -> Optional[Dict]:
         """Get a specific problem by ID"""
@@ -39,15 +110,12 @@ class ProblemService:
     
     def get_problems_by_difficulty(self, difficulty: str) -> List[Dict]:
         """Get all problems of a specific difficulty"""
-        return [
-            problem for problem in self._problems_cache.values()
-            if problem.get('difficulty') == difficulty
-        ]
+        return list(self._by_difficulty.get(difficulty, ()))
     
     def get_random_problem(self, difficulty: str = None) -> Optional[Dict]:
         """Get a random problem, optionally filtered by difficulty"""
         if difficulty:
-            problems = self.get_problems_by_difficulty(difficulty)
+            problems = self._by_difficulty.get(difficulty)
         else:
             problems = list(self._problems_cache.values())
         
@@ -56,30 +124,64 @@ class ProblemService:
         
         return random.choice(problems)
     
+    def get_db_problems_by_difficulty(self, db: Session, difficulty: str) -> List[Dict]:
+        """Get active DB problems of a difficulty, cached for a few minutes"""
+        with _db_problems_lock:
+            cached = _db_problems_cache.get(difficulty)
+        if cached is not None:
+            return cached
+        
+        # Plain dicts, so cached entries never hold on to a request's Session
+        problems = [
+            {
+                'id': problem.id,
+                'title': problem.title,
+                'category': problem.category,
+                'code': problem.code
+            }
+            for problem in ProblemCRUD.get_problems_by_difficulty(db, difficulty)
+        ]
+        with _db_problems_lock:
+            _db_problems_cache[difficulty] = problems
+        return problems
+    
+    def get_db_problem(self, db: Session, problem_id: str) -> Optional[Dict]:
+        """Get an active DB problem for scoring, cached for a few minutes"""
+        # One lookup: a membership test and a read can straddle the entry's expiry
+        with _db_problems_lock:
+            cached = _db_problem_cache.get(problem_id, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
+        problem = ProblemCRUD.get_problem_by_id(db, problem_id)
+        if problem:
+            problem = index_problem_bugs({
+                'id': problem.id,
+                'title': problem.title,
+                'category': problem.category,
+                'bugs': problem.bugs
+            })
+        with _db_problems_lock:
+            _db_problem_cache[problem_id] = problem
+        return problem
+    
+    def invalidate_db_problems(self):
+        """Drop cached DB problems after the problems table changes"""
+        with _db_problems_lock:
+            _db_problems_cache.clear()
+            _db_problem_cache.clear()
+    
     def get_all_problems(self) -> List[Dict]:
         """Get all available problems"""
         return list(self._problems_cache.values())
     
     def get_problem_stats(self) -> Dict:
         """Get statistics about available problems"""
-        problems = list(self._problems_cache.values())
-        
-        stats = {
-            'total': len(problems),
-            'by_difficulty': {},
-            'by_category': {}
+        return {
+            'total': len(self._problems_cache),
+            'by_difficulty': {difficulty: len(problems) for difficulty, problems in self._by_difficulty.items()},
+            'by_category': {category: len(problems) for category, problems in self._by_category.items()}
         }
-        
-        for problem in problems:
-            # Count by difficulty
-            difficulty = problem.get('difficulty', 'unknown')
-            stats['by_difficulty'][difficulty] = stats['by_difficulty'].get(difficulty, 0) + 1
-            
-            # Count by category
-            category = problem.get('category', 'unknown')
-            stats['by_category'][category] = stats['by_category'].get(category, 0) + 1
-        
-        return stats
 
 # Global instance
 problem_service = ProblemService()
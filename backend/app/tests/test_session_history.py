@@ -0,0 +1,37 @@
+"""
+Session history keyset paging
+"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.endpoints.session import _decode_history_cursor, _encode_history_cursor
+from app.db.crud import GameSessionCRUD
+from app.db.models import Base
+
+
+def test_history_pages_sessions_started_in_the_same_second():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    
+    # Stored the way SQLite's CURRENT_TIMESTAMP server default stores it
+    for session_id in ("s1", "s2", "s3"):
+        db.execute(
+            text(
+                "INSERT INTO game_sessions (id, session_id, user_id, problem_id, difficulty, time_limit, status, started_at) "
+                "VALUES (:id, :id, 'u1', 'p1', 'beginner', 900, 'completed', '2026-10-15 22:07:08')"
+            ),
+            {"id": session_id},
+        )
+    db.commit()
+    
+    first_page = GameSessionCRUD.get_recent_sessions(db, "u1", limit=2)
+    cursor = _encode_history_cursor(first_page[-1])
+    second_page = GameSessionCRUD.get_recent_sessions(db, "u1", limit=2, before=_decode_history_cursor(cursor))
+    
+    assert [row.session_id for row in first_page] == ["s3", "s2"]
+    assert [row.session_id for row in second_page] == ["s1"]
+    assert first_page[0].started_at == datetime(2026, 10, 15, 22, 7, 8)
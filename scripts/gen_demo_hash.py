@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Print the bcrypt hash for DEMO_PASSWORD in backend/app/db/init_db.py
+
+Run after changing the demo password and paste the output into
+DEMO_PASSWORD_HASH.
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.db.init_db import DEMO_PASSWORD
+from app.services.auth_service import AuthService
+
+if __name__ == "__main__":
+    print(AuthService.get_password_hash(DEMO_PASSWORD))
@@ -10,24 +10,21 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 from app.db.init_db import init_database
 import logging
 
+logger = logging.getLogger("init_db")
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    print("🗄️ Initializing Code Review Quest Database...")
-    print("=" * 50)
+    logger.info("🗄️ Initializing Code Review Quest Database...")
     
     try:
         init_database()
-        print("\n✅ Database initialization completed successfully!")
-        print("\n🎮 Your Code Review Quest database is ready!")
-        print("   - Problems loaded and ready")
-        print("   - Badges system configured")
-        print("   - Demo user created")
-        print("   - All tables created")
+        logger.info("✅ Database initialization completed successfully!")
+        logger.info("🎮 Tables, problems, badges and the demo user are ready")
         
     except Exception as e:
-        print(f"\n❌ Database initialization failed: {e}")
+        logger.error("❌ Database initialization failed: %s", e)
         sys.exit(1)
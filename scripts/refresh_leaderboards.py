@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Rebuild the stored global and weekly leaderboards; run from cron (e.g. every minute)
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from app.services.leaderboard_service import LeaderboardService
+import logging
+
+logger = logging.getLogger("refresh_leaderboards")
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    try:
+        LeaderboardService.refresh_materialized()
+        logger.info("✅ Leaderboards refreshed")
+    except Exception as e:
+        logger.error("❌ Leaderboard refresh failed: %s", e)
+        sys.exit(1)
@@ -4,6 +4,7 @@ Code Review Quest Worker
 Handles code analysis and processing tasks
 """
 
+import json
 import time
 import redis
 import logging
@@ -13,22 +14,45 @@ from typing import Dict, Any
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Redis list the API pushes JSON-encoded tasks onto
+TASK_QUEUE = "tasks"
+# Seconds BLPOP waits before returning empty; the socket timeout must exceed it
+BLPOP_TIMEOUT = 30
+
+
+def process_task(task: Dict[str, Any]):
+    """Process a single task (placeholder)"""
+    logger.debug("⚙️ Processing task: %s", task.get('type', 'unknown'))
+
+
 def main():
     """Main worker loop"""
     logger.info("🔧 Starting Code Review Quest Worker")
     
     try:
-        # Connect to Redis
-        r = redis.Redis(host='redis', port=6379, decode_responses=True)
+        # Connect to Redis through a pool that concurrent consumers can share
+        pool = redis.ConnectionPool(
+            host='redis',
+            port=6379,
+            max_connections=16,
+            decode_responses=True,
+            socket_timeout=BLPOP_TIMEOUT + 30,
+            health_check_interval=BLPOP_TIMEOUT,
+        )
+        r = redis.Redis(connection_pool=pool)
         r.ping()
         logger.info("✅ Connected to Redis")
         
         # Worker loop
         while True:
             try:
-                # Check for tasks (placeholder)
-                logger.info("🔍 Checking for tasks...")
-                time.sleep(10)
+                # Block until a task is pushed instead of polling; the timeout
+                # lets a dead connection surface instead of hanging forever
+                item = r.blpop(TASK_QUEUE, timeout=BLPOP_TIMEOUT)
+                if item is None:
+                    continue
+                _, payload = item
+                process_task(json.loads(payload))
                 
             except Exception as e:
                 logger.error(f"❌ Error processing task: {e}")